@@ -0,0 +1,171 @@
+"""
+Benchmark of the chapter 14 algorithms on seeded synthetic graphs.
+
+Every case runs one algorithm on one generated graph and reports the best time over a few runs, the peak
+memory allocated during a separate traced run, and the number of vertices and edges processed per second
+(n^3 vertex triples for floydWarshall). Results are printed or written as JSON; comparing them with a
+previous JSON file reports the cases that became slower.
+
+    PYTHONPATH=.. python benchmark.py --size 20000 --output before.json
+    PYTHONPATH=.. python benchmark.py --size 20000 --baseline before.json
+"""
+import argparse
+import importlib
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+from bfs import simpleBFS
+from dfs import simpleDFS_complete
+from generators import erdos_renyi_graph, barabasi_albert_graph, grid_graph, random_dag, random_geometric_graph
+
+shortest_path = importlib.import_module("shortest-path")
+spanning_tree = importlib.import_module("minimum-spanning-tree")
+ordering = importlib.import_module("topoligical-ordering")
+closure = importlib.import_module("transitive-closure")
+
+GRAPHS = {  # name -> function building a graph of about n vertices from a seed
+    "erdos_renyi": lambda n, seed: erdos_renyi_graph(n, min(4 * n, n * (n - 1) // 2), seed),
+    "barabasi_albert": lambda n, seed: barabasi_albert_graph(n, 4, seed),
+    "grid": lambda n, seed: grid_graph(math.isqrt(n), math.isqrt(n), seed),
+    "geometric": lambda n, seed: random_geometric_graph(n, seed=seed),
+    "dag": lambda n, seed: random_dag(n, min(4 * n, n * (n - 1) // 2), seed),
+}
+
+
+def _first(g):
+    """Return the first vertex of g"""
+    return next(iter(g.vertices()))
+
+
+# name -> (function running the algorithm on a graph, graphs it runs on, fraction of the size used, work(n, m))
+ALGORITHMS = {
+    "simpleBFS": (lambda g: simpleBFS(g, _first(g), {_first(g): 0}),
+                  ("erdos_renyi", "barabasi_albert", "grid", "geometric"), 1, None),
+    "simpleDFS_complete": (simpleDFS_complete, ("erdos_renyi", "barabasi_albert", "grid", "geometric", "dag"), 1, None),
+    "simple_shortest_path": (lambda g: shortest_path.simple_shortest_path(g, _first(g)),
+                             ("erdos_renyi", "barabasi_albert", "grid", "geometric"), 1, None),
+    "mst_prim_jarnik": (spanning_tree.mst_prim_jarnik, ("erdos_renyi", "barabasi_albert", "grid", "geometric"), 1, None),
+    "mst_kruskal": (spanning_tree.mst_kruskal, ("erdos_renyi", "barabasi_albert", "grid", "geometric"), 1, None),
+    "topological_sort": (ordering.topological_sort, ("dag",), 1, None),
+    "floydWarshall": (closure.floydWarshall, ("erdos_renyi", "dag"), 0.01, lambda n, m: n ** 3),
+}
+
+
+def run_case(algorithm, g, repeat=3):
+    """
+    Run one algorithm on graph g.
+    :return: a dictionary with the best time in seconds over repeat runs and the peak traced memory in bytes
+    """
+    run = ALGORITHMS[algorithm][0]
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(g)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()  # tracing slows allocations down, so memory is measured in its own run
+    try:
+        run(g)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def run_suite(size=20000, seed=0, repeat=3, algorithms=None, graphs=None, log=None):
+    """
+    Run every selected algorithm on every selected graph it supports.
+
+    Graphs are generated once per (kind, number of vertices) from seed, so runs with the same arguments measure
+    the same inputs. Generation time is not measured.
+    :param size: number of vertices of the graphs, scaled down for the slower algorithms
+    :param seed: seed of the graph generators
+    :param repeat: number of timed runs per case
+    :param algorithms: names of the algorithms to run, all by default
+    :param graphs: names of the graph kinds to use, all by default
+    :param log: optional function called with a line of progress after each case
+    :return: list of result dictionaries, one per case
+    """
+    cache = {}
+    results = []
+    for algorithm in algorithms or ALGORITHMS:
+        _, kinds, fraction, work = ALGORITHMS[algorithm]
+        for kind in kinds:
+            if graphs is not None and kind not in graphs:
+                continue
+            n = max(2, int(size * fraction))
+            if (kind, n) not in cache:
+                cache[kind, n] = GRAPHS[kind](n, seed)
+            g = cache[kind, n]
+            n, m = g.vertex_count(), g.edge_count()
+            result = {"algorithm": algorithm, "graph": kind, "n": n, "m": m}
+            result.update(run_case(algorithm, g, repeat))
+            operations = work(n, m) if work is not None else n + m
+            result["ops_per_second"] = operations / result["seconds"] if result["seconds"] > 0 else math.inf
+            results.append(result)
+            if log is not None:
+                log(f"{algorithm:>22} {kind:>16} n={n:<8} m={m:<9} {result['seconds']:9.4f} s "
+                    f"{result['peak_bytes'] / 2 ** 20:9.2f} MiB {result['ops_per_second']:12.0f} ops/s")
+    return results
+
+
+def regressions(results, baseline, tolerance=0.2):
+    """
+    Compare results with those of a previous run.
+    :param baseline: list of result dictionaries of the previous run
+    :param tolerance: relative slowdown accepted, 0.2 for 20%
+    :return: list of (algorithm, graph, old seconds, new seconds) for the cases of the same size that are slower
+    """
+    old = {(r["algorithm"], r["graph"], r["n"], r["m"]): r["seconds"] for r in baseline}
+    slower = []
+    for r in results:
+        before = old.get((r["algorithm"], r["graph"], r["n"], r["m"]))
+        if before is not None and r["seconds"] > before * (1 + tolerance):
+            slower.append((r["algorithm"], r["graph"], before, r["seconds"]))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=20000, help="number of vertices of the graphs")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the graph generators")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case, the best one is kept")
+    parser.add_argument("--algorithm", action="append", choices=list(ALGORITHMS), help="algorithm to run (repeatable)")
+    parser.add_argument("--graph", action="append", choices=list(GRAPHS), help="graph kind to use (repeatable)")
+    parser.add_argument("--output", help="JSON file to write, standard output by default")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.size, args.seed, args.repeat, args.algorithm, args.graph,
+                        log=lambda line: print(line, file=sys.stderr))
+    report = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "size": args.size,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f)["results"], args.tolerance)
+        for algorithm, kind, before, after in slower:
+            print(f"regression: {algorithm} on {kind}: {before:.4f} s -> {after:.4f} s", file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from queue import Queue
+from collections import deque
 
 from base import Graph, Vertex
 
@@ -22,17 +22,16 @@ def simpleBFS(g: Graph, s: Vertex, discovered: dict):
 def queueBFS(g: Graph, s: Vertex, discovered: dict):
     """Compute a simple BFS algorithm using a FIFO queue"""
 
-    q = Queue()
-    q.put(s)
+    q = deque([s])
 
-    while not q.empty():
-        u = q.get()
+    while q:
+        u = q.popleft()
 
         for e in g.incident_edges(u):
             v = e.opposite(u)
             if v not in discovered:
                 discovered[v] = discovered[u] + e.element()
-                q.put(v)
+                q.append(v)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,277 @@
+import time
+from array import array
+from heapq import heappush, heappop
+
+from base import Graph
+
+INF = float("inf")
+
+
+def bipartition(g: Graph):
+    """
+    Split the vertices of g into two sides such that every edge joins the two sides, by coloring each
+    connected component with a breadth-first search. Edge directions are ignored.
+    :return: a pair (left, right) of lists of vertices, the first vertex of each component being on the left
+    :raise ValueError: if g has an odd cycle, and so is not bipartite
+    """
+    side = {}
+    for root in g.vertices():
+        if root in side:
+            continue
+        side[root] = 0
+        level = [root]
+        while level:
+            next_level = []
+            for u in level:
+                for outgoing in (True, False) if g.is_directed() else (True,):
+                    for e in g.incident_edges(u, outgoing):
+                        v = e.opposite(u)
+                        if v not in side:
+                            side[v] = 1 - side[u]
+                            next_level.append(v)
+                        elif side[v] == side[u]:
+                            raise ValueError(f"graph is not bipartite: edge {e} closes an odd cycle")
+            level = next_level
+    return [v for v in side if side[v] == 0], [v for v in side if side[v] == 1]
+
+
+class _Bipartite:
+    """
+    Arcs from the left side to the right side of a bipartite graph in CSR arrays.
+
+    Left vertices are numbered 0..len(left)-1 and right vertices 0..len(right)-1. The arcs of left vertex i
+    are arcs offsets[i]..offsets[i + 1] - 1; arc a goes to right vertex columns[a] and stands for edge
+    edges[a] of the graph.
+    """
+
+    def __init__(self, g: Graph, left=None, smaller_left=False):
+        if left is None:
+            left, right = bipartition(g)
+        else:
+            left = list(left)
+            chosen = set(left)
+            right = [v for v in g.vertices() if v not in chosen]
+        if smaller_left and len(left) > len(right):
+            left, right = right, left
+        self.left, self.right = left, right
+        row = {v: i for i, v in enumerate(left)}
+        column = {v: j for j, v in enumerate(right)}
+
+        pairs = []
+        offsets = array("q", bytes(8 * (len(left) + 1)))
+        for e in g.edges():
+            a, b = e.endpoints()
+            i, j = (row[a], column.get(b)) if a in row else (row.get(b), column[a])
+            if i is None or j is None:
+                raise ValueError(f"edge {e} joins two vertices of the same side")
+            pairs.append((i, j, e))
+            offsets[i + 1] += 1
+        for i in range(len(left)):
+            offsets[i + 1] += offsets[i]
+
+        self.offsets = offsets
+        self.columns = array("q", bytes(8 * len(pairs)))
+        self.edges = [None] * len(pairs)
+        free = offsets[:len(left)]
+        for i, j, e in pairs:
+            a = free[i]
+            free[i] += 1
+            self.columns[a] = j
+            self.edges[a] = e
+
+
+def hopcroft_karp(g: Graph, left=None):
+    """
+    Compute a maximum-cardinality matching of a bipartite graph with the Hopcroft-Karp algorithm.
+
+    After a greedy start, each phase finds the length of the shortest augmenting paths by a breadth-first
+    search from all free left vertices at once, then augments along a maximal set of vertex-disjoint paths of
+    that length with depth-first searches that only go one layer deeper. There are O(sqrt(n)) phases of O(m)
+    time each.
+    :param left: the vertices of one side, found by bipartition(g) if None
+    :return: the list of matched edges
+    """
+    b = _Bipartite(g, left)
+    nl, nr = len(b.left), len(b.right)
+    offsets, columns = b.offsets, b.columns
+    mate_left = array("q", [-1]) * nl  # right vertex matched with each left vertex, -1 if free
+    mate_right = array("q", [-1]) * nr
+    matched_arc = array("q", [-1]) * nl
+
+    for i in range(nl):  # greedy start
+        for a in range(offsets[i], offsets[i + 1]):
+            j = columns[a]
+            if mate_right[j] < 0:
+                mate_left[i], mate_right[j], matched_arc[i] = j, i, a
+                break
+
+    layer = array("q", [0]) * nl
+    while True:
+        free = [i for i in range(nl) if mate_left[i] < 0]
+        for i in range(nl):
+            layer[i] = -1
+        for i in free:
+            layer[i] = 0
+        limit = nl + 1  # layer + 1 of the first free right vertex found
+        queue = free[:]
+        for i in queue:  # queue grows during the loop
+            if layer[i] + 1 >= limit:
+                break
+            for a in range(offsets[i], offsets[i + 1]):
+                k = mate_right[columns[a]]
+                if k < 0:
+                    limit = layer[i] + 1
+                elif layer[k] < 0:
+                    layer[k] = layer[i] + 1
+                    queue.append(k)
+        if limit > nl:
+            break  # no augmenting path: the matching is maximum
+
+        current = offsets[:nl]  # next arc to try from each left vertex
+        for root in free:
+            stack = [root]
+            while stack:
+                i = stack[-1]
+                a = current[i]
+                if a == offsets[i + 1]:
+                    layer[i] = -1  # dead end for the rest of the phase
+                    stack.pop()
+                    continue
+                k = mate_right[columns[a]]
+                if k < 0:
+                    if layer[i] + 1 == limit:
+                        for i in stack:  # flip the path; current[i] is the arc it took
+                            a = current[i]
+                            j = columns[a]
+                            mate_left[i], mate_right[j], matched_arc[i] = j, i, a
+                            layer[i] = -1  # keep the paths of a phase vertex-disjoint
+                        break
+                    current[i] += 1
+                elif layer[k] == layer[i] + 1:
+                    stack.append(k)
+                else:
+                    current[i] += 1
+    return [b.edges[a] for a in matched_arc if a >= 0]
+
+
+def min_cost_assignment(g: Graph, left=None, maximize=False):
+    """
+    Match every vertex of the smaller side of a bipartite graph, minimizing the sum of the edge elements
+    (the costs), with the Hungarian method on sparse arcs.
+
+    Left vertices are added one at a time along a shortest augmenting path, found by Dijkstra's algorithm on
+    the reduced costs c(i, j) - u[i] - v[j], which the potentials u and v keep non-negative, and zero on the
+    matched edges. Each search stops at the first free right vertex it settles, which is usually one of the
+    first few, so the cost is far below the O(n^3) of the dense method on sparse graphs. When both sides have
+    the same size, free right vertices become rare at the end and the last searches cover most of the graph.
+    Costs may be negative.
+    :param left: the vertices of one side, found by bipartition(g) if None; the smaller side is the one matched
+    :param maximize: True to maximize the sum of the elements instead
+    :return: a pair (cost, edges) of the total cost and the list of matched edges
+    :raise ValueError: if no matching covers the smaller side
+    """
+    b = _Bipartite(g, left, smaller_left=True)
+    nl, nr = len(b.left), len(b.right)
+    offsets, columns = b.offsets, b.columns
+    sign = -1 if maximize else 1
+    cost = array("d", (sign * e.element() for e in b.edges))
+    row = array("q", bytes(8 * len(columns)))  # left vertex of each arc
+    for i in range(nl):
+        for a in range(offsets[i], offsets[i + 1]):
+            row[a] = i
+
+    u = [0.0] * nl  # lists: the potentials and distances are read and written in the inner loop
+    for i in range(nl):
+        if offsets[i] == offsets[i + 1]:
+            raise ValueError(f"vertex {b.left[i]} has no edge")
+        u[i] = min(cost[offsets[i]:offsets[i + 1]])
+    v = [0.0] * nr
+    mate_left = array("q", [-1]) * nl
+    mate_right = array("q", [-1]) * nr
+    matched_arc = array("q", [-1]) * nl
+    dist = [INF] * nr
+    parent = array("q", [-1]) * nr  # arc that reached each right vertex
+    settled = bytearray(nr)
+
+    for start in range(nl):
+        touched, done = [], []
+        heap = []
+        i, d_i = start, 0.0
+        while True:
+            base = d_i - u[i]
+            for a in range(offsets[i], offsets[i + 1]):
+                j = columns[a]
+                d = base + cost[a] - v[j]
+                if d < dist[j] and not settled[j]:  # rounding can make a settled distance look improvable
+                    if dist[j] == INF:
+                        touched.append(j)
+                    dist[j] = d
+                    parent[j] = a
+                    heappush(heap, (d, j))
+            while heap:
+                d, j = heappop(heap)
+                if not settled[j] and d == dist[j]:
+                    break
+            else:
+                raise ValueError(f"no matching covers vertex {b.left[start]} and the ones before it")
+            settled[j] = 1
+            if mate_right[j] < 0:
+                break
+            done.append(j)
+            i, d_i = mate_right[j], d
+
+        u[start] += d  # shift the potentials so that the path becomes tight
+        for k in done:
+            delta = d - dist[k]
+            v[k] -= delta
+            u[mate_right[k]] += delta
+        while True:  # augment along the parents, from the free right vertex j back to start
+            a = parent[j]
+            i = row[a]
+            previous = mate_left[i]
+            mate_left[i], mate_right[j], matched_arc[i] = j, i, a
+            if i == start:
+                break
+            j = previous
+        for j in touched:
+            dist[j] = INF
+            settled[j] = 0
+
+    edges = [b.edges[a] for a in matched_arc]
+    return sum(e.element() for e in edges), edges
+
+
+if __name__ == "__main__":
+    g = Graph()
+    workers = [g.insert_vertex(x) for x in ("ann", "bob", "cid", "dee")]
+    jobs = [g.insert_vertex(x) for x in ("cook", "drive", "paint", "wire")]
+    ann, bob, cid, dee = workers
+    cook, drive, paint, wire = jobs
+
+    g.insert_edge(ann, cook, 4)
+    g.insert_edge(ann, drive, 1)
+    g.insert_edge(bob, cook, 2)
+    g.insert_edge(bob, paint, 5)
+    g.insert_edge(cid, drive, 3)
+    g.insert_edge(cid, paint, 2)
+    g.insert_edge(cid, wire, 6)
+    g.insert_edge(dee, drive, 2)
+    g.insert_edge(dee, wire, 3)
+
+    print(len(hopcroft_karp(g)))  # 4
+    cost, edges = min_cost_assignment(g, workers)
+    print(cost, sorted((str(e.endpoints()[0]), str(e.endpoints()[1])) for e in edges))
+    # 8 [('ann', 'drive'), ('bob', 'cook'), ('cid', 'paint'), ('dee', 'wire')]
+    print(min_cost_assignment(g, workers, maximize=True)[0])  # 17
+
+    # benchmark: 100000 workers, 110000 jobs, 3 candidate jobs per worker
+    from generators import random_bipartite_graph
+
+    big, left, right = random_bipartite_graph(100000, 110000, degree=3, seed=25)
+    print(f"graph: {big.vertex_count()} vertices, {big.edge_count()} edges")  # 210000 vertices, 300000 edges
+    start = time.perf_counter()
+    matching = hopcroft_karp(big, left)
+    print(f"{'hopcroft_karp':>20}: {time.perf_counter() - start:.2f} s, {len(matching)} matched")  # ~4 s, 100000 matched
+    start = time.perf_counter()
+    cost, edges = min_cost_assignment(big, left)
+    print(f"{'min_cost_assignment':>20}: {time.perf_counter() - start:.2f} s, cost {cost}")  # ~7 s, cost 3660685
@@ -0,0 +1,163 @@
+import os
+import random
+import tempfile
+import time
+from array import array
+from collections.abc import Iterable
+
+from base import Graph, ArrayPartition
+
+
+class StreamingComponents:
+    """
+    Connected components of an undirected graph given as a stream of edges.
+
+    Each edge is merged into an ArrayPartition as soon as it is read and then forgotten, so memory is
+    O(n) whatever the number of edges: a 16 bytes per vertex partition, plus a dictionary from labels
+    to integer ids unless the vertices are already the integers 0..n-1.
+    """
+
+    def __init__(self, n=None):
+        """
+        :param n: number of vertices if they are the integers 0..n-1, None for arbitrary hashable labels
+        """
+        self._forest = ArrayPartition(n or 0)
+        self._ids = None if n is not None else {}  # label -> id
+        self._labels = None if n is not None else []  # id -> label
+
+    def _id(self, x):
+        """Return the id of label x, adding x as a new singleton component if it is new"""
+        if self._ids is None:
+            return x
+        i = self._ids.get(x)
+        if i is None:
+            i = self._ids[x] = self._forest.make_group()
+            self._labels.append(x)
+        return i
+
+    def add_vertex(self, x):
+        """Add vertex x, isolated until an edge reaches it"""
+        self._id(x)
+
+    def add_edge(self, x, y):
+        """Merge the components of x and y. Return True if they were different components"""
+        return self._forest.union(self._id(x), self._id(y))
+
+    def add_edges(self, edges: Iterable):
+        """Merge the endpoints of every (x, y, ...) tuple of edges, for instance a chunk of graph_io.read_edge_chunks"""
+        union, vertex_id = self._forest.union, self._id
+        if self._ids is None:
+            for edge in edges:
+                union(edge[0], edge[1])
+        else:
+            for edge in edges:
+                union(vertex_id(edge[0]), vertex_id(edge[1]))
+
+    def vertex_count(self):
+        """Return the number of vertices seen so far"""
+        return len(self._forest)
+
+    def component_count(self):
+        """Return the number of connected components"""
+        return self._forest.group_count()
+
+    def _lookup(self, x):
+        """Return the id of label x, None if it was never seen"""
+        return x if self._ids is None else self._ids.get(x)
+
+    def connected(self, x, y):
+        """Return True if x and y are in the same component; a label never seen is an isolated vertex"""
+        i, j = self._lookup(x), self._lookup(y)
+        if i is None or j is None:
+            return x == y
+        return self._forest.find(i) == self._forest.find(j)
+
+    def size(self, x):
+        """Return the number of vertices in the component of x, 1 for a label never seen"""
+        i = self._lookup(x)
+        return 1 if i is None else self._forest.size(i)
+
+    def labels(self):
+        """
+        Number the components 0, 1, ..., k-1 in order of their first vertex.
+        :return: an array whose entry i is the component of the vertex of id i, and the array of component sizes
+        """
+        forest = self._forest
+        comp = array("q", bytes(8 * len(forest)))
+        sizes = array("q")
+        number = {}  # leader -> component number
+        for i in range(len(forest)):
+            leader = forest.find(i)
+            c = number.get(leader)
+            if c is None:
+                c = number[leader] = len(sizes)
+                sizes.append(forest.size(leader))
+            comp[i] = c
+        return comp, sizes
+
+    def components(self):
+        """Generate (vertex, component number) pairs, with the numbering of labels()"""
+        comp, _ = self.labels()
+        for i, c in enumerate(comp):
+            yield (i if self._labels is None else self._labels[i]), c
+
+
+def connected_components(g: Graph):
+    """
+    Compute the connected components of an undirected graph g with union-find, without any traversal.
+    :param g: an undirected Graph or CSRGraph
+    :return: a pair (comp, count) where comp maps each vertex to its component number in 0..count-1
+    """
+    stream = StreamingComponents()
+    for v in g.vertices():
+        stream.add_vertex(v)
+    stream.add_edges(e.endpoints() for e in g.edges())
+    comp = dict(stream.components())
+    return comp, stream.component_count()
+
+
+if __name__ == "__main__":
+    g = Graph()
+    v1 = g.insert_vertex(1)
+    v2 = g.insert_vertex(2)
+    v3 = g.insert_vertex(3)
+    v4 = g.insert_vertex(4)
+    v5 = g.insert_vertex(5)
+
+    g.insert_edge(v1, v3)
+    g.insert_edge(v3, v2)
+    g.insert_edge(v4, v5)
+
+    comp, count = connected_components(g)
+    print(comp, count)  # {1: 0, 2: 0, 3: 0, 4: 1, 5: 1} 2
+
+    stream = StreamingComponents()
+    stream.add_edges([("paris", "lyon"), ("lyon", "marseille"), ("lille", "brussels")])
+    print(stream.component_count(), stream.size("marseille"), stream.connected("paris", "lille"))  # 2 3 False
+    print(stream.connected("paris", "nice"), stream.size("nice"), stream.component_count())  # False 1 2
+
+    # benchmark: components of an edge file, streamed in chunks vs a graph and a DFS forest
+    from dfs import simpleDFS_complete
+    from graph_io import read_edge_chunks
+
+    n, m = 200_000, 150_000
+    rnd = random.Random(19)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "edges.tsv")
+        with open(path, "w") as f:
+            for _ in range(m):
+                f.write(f"{rnd.randrange(n)}\t{rnd.randrange(n)}\n")
+        start = time.perf_counter()
+        stream = StreamingComponents(n)
+        for chunk in read_edge_chunks(path, label=int):
+            stream.add_edges(chunk)
+        comp, sizes = stream.labels()
+        print(f"{'StreamingComponents':>20}: {time.perf_counter() - start:.2f} s, "
+              f"{stream.component_count()} components, largest {max(sizes)}")
+        start = time.perf_counter()
+        big = Graph.from_edges(edge for chunk in read_edge_chunks(path, label=int) for edge in chunk)
+        forest = simpleDFS_complete(big)
+        roots = sum(1 for u in forest if forest[u] is None)
+        isolated = n - big.vertex_count()  # vertices without edges are not in the file
+        print(f"{'simpleDFS_complete':>20}: {time.perf_counter() - start:.2f} s, {roots + isolated} components")
+        assert roots + isolated == stream.component_count()
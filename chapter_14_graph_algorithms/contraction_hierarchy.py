@@ -0,0 +1,381 @@
+import importlib
+import math
+import mmap
+import os
+import pickle
+import random
+import struct
+import tempfile
+import time
+from array import array
+from heapq import heappush, heappop
+
+from base import Graph, Vertex, Edge
+
+INF = float("inf")
+MAGIC = b"CHIERARC"
+HEADER = struct.Struct("=8sqqqq")  # magic, byte order mark, n, upward arcs, downward arcs
+
+
+class Shortcut(Edge):
+    """Edge added by the contraction of a vertex: it stands for the path origin -> via -> destination."""
+    __slots__ = "_via",
+
+    def __init__(self, u, v, x, via):
+        super().__init__(u, v, x)
+        self._via = via
+
+    def via(self):
+        """Return the contracted vertex the shortcut bypasses"""
+        return self._via
+
+
+class ContractionHierarchy:
+    """
+    Shortest path oracle for road networks built by contracting vertices one by one, least important first.
+
+    Contracting v removes it from the graph and adds a shortcut u -> x for every pair of neighbors whose only
+    shortest path goes through v, so distances between the remaining vertices do not change. Every vertex gets
+    the rank of its contraction, and every shortest path of the original graph becomes a path that goes up in
+    rank and then down. A query is a bidirectional Dijkstra that only follows edges to higher ranks from both
+    ends, which settles a few hundred vertices even on continental graphs.
+
+    Arcs are stored in CSR arrays: the upward arcs of each vertex, and the arcs entering it from higher ranks
+    (searched backwards). The via array of an arc is the id of the contracted vertex of a shortcut, -1 for an
+    original edge. save and load persist these arrays in a binary file that is memory-mapped back.
+    """
+
+    def __init__(self, g: Graph = None, max_settled=60):
+        """
+        Contract every vertex of g; edge elements are the (non-negative) lengths.
+
+        Vertices are picked by edge difference: the number of shortcuts their contraction adds minus the number
+        of edges it removes, plus the number of neighbors already contracted to spread the contractions evenly.
+        Priorities are recomputed lazily: a vertex reaching the top of the heap is put back if its updated
+        priority is no longer the smallest.
+        :param g: a directed or undirected Graph, None for an empty hierarchy (see load)
+        :param max_settled: size limit of the witness searches; a smaller limit misses some witnesses and adds
+                            unnecessary shortcuts, it never breaks correctness
+        """
+        self._vertices = []
+        self._index = None
+        self._shortcuts = []
+        self._mapped = None  # (block, views) of a hierarchy loaded by load
+        if g is None:
+            self._rank = array("q")
+            self._up = self._down = (array("q", [0]), array("q"), array("d"), array("q"))
+            return
+
+        self._vertices = list(g.vertices())
+        index = {v: i for i, v in enumerate(self._vertices)}
+        n = len(self._vertices)
+        out = [{} for _ in range(n)]  # out[u][x] = (length, via) of the arc u -> x of the remaining graph
+        into = [{} for _ in range(n)]
+        for e in g.edges():
+            a, b = e.endpoints()
+            u, x, w = index[a], index[b], e.element()
+            pairs = ((u, x),) if g.is_directed() else ((u, x), (x, u))
+            for s, t in pairs:
+                if s != t and w < out[s].get(t, (INF,))[0]:
+                    out[s][t] = into[t][s] = (w, -1)
+
+        self._max_settled = max_settled
+        contracted = bytearray(n)
+        deleted = [0] * n  # number of contracted neighbors
+        level = [0] * n  # 1 + largest level of a contracted neighbor
+        rank = array("q", bytes(8 * n))
+        up = [[] for _ in range(n)]  # (x, length, via) of the arcs v -> x to higher ranks
+        down = [[] for _ in range(n)]  # (u, length, via) of the arcs u -> v from higher ranks
+
+        heap = [(self._priority(v, out, into, deleted, level), v) for v in range(n)]
+        heap.sort()
+        r = 0
+        while heap:
+            _, v = heappop(heap)
+            if contracted[v]:
+                continue
+            p = self._priority(v, out, into, deleted, level)
+            if heap and p > heap[0][0]:
+                heappush(heap, (p, v))  # outdated priority
+                continue
+            for u, x, w in list(self._shortcuts_of(v, out, into)):
+                if w < out[u].get(x, (INF,))[0]:
+                    out[u][x] = into[x][u] = (w, v)
+                    self._shortcuts.append(Shortcut(self._vertices[u], self._vertices[x], w, self._vertices[v]))
+            for x, (w, via) in out[v].items():
+                up[v].append((x, w, via))
+                del into[x][v]
+            for u, (w, via) in into[v].items():
+                down[v].append((u, w, via))
+                del out[u][v]
+            neighbors = set(out[v]).union(into[v])
+            out[v] = into[v] = None
+            contracted[v] = 1
+            rank[v] = r
+            r += 1
+            for x in neighbors:
+                deleted[x] += 1
+                level[x] = max(level[x], level[v] + 1)
+
+        self._rank = rank
+        self._up = self._arrays(up)
+        self._down = self._arrays(down)
+
+    @staticmethod
+    def _arrays(lists):
+        """Return the (offsets, targets, lengths, via) CSR arrays of per-vertex lists of (target, length, via)"""
+        offsets, targets, lengths, via = array("q", [0]), array("q"), array("d"), array("q")
+        for arcs in lists:
+            for x, w, v in arcs:
+                targets.append(x)
+                lengths.append(w)
+                via.append(v)
+            offsets.append(len(targets))
+        return offsets, targets, lengths, via
+
+    def _witness_search(self, u, v, limit, targets, out):
+        """
+        Return the distances from u in the remaining graph without v, stopping beyond limit, once every vertex of
+        targets is settled or after max_settled vertices
+        """
+        dist = {u: 0}
+        heap = [(0, u)]
+        remaining = len(targets)
+        settled = 0
+        while heap:
+            k, x = heappop(heap)
+            if k > dist[x]:
+                continue
+            if k > limit or settled == self._max_settled:
+                break
+            if x in targets:
+                remaining -= 1
+                if remaining == 0:
+                    break
+            settled += 1
+            for y, (w, _) in out[x].items():
+                if y != v and k + w < dist.get(y, INF):
+                    dist[y] = k + w
+                    heappush(heap, (k + w, y))
+        return dist
+
+    def _shortcuts_of(self, v, out, into):
+        """Generate (u, x, length) for every shortcut needed to contract v"""
+        targets = out[v]
+        if not targets:
+            return
+        farthest = max(w for w, _ in targets.values())
+        for u, (w_uv, _) in into[v].items():
+            dist = self._witness_search(u, v, w_uv + farthest, targets, out)
+            for x, (w_vx, _) in targets.items():
+                if x != u and dist.get(x, INF) > w_uv + w_vx:
+                    yield u, x, w_uv + w_vx
+
+    def _priority(self, v, out, into, deleted, level):
+        """Edge difference of v plus its number of contracted neighbors and its level"""
+        added = sum(1 for _ in self._shortcuts_of(v, out, into))
+        return added - len(out[v]) - len(into[v]) + deleted[v] + level[v]
+
+    def vertex_count(self):
+        """Return the number of vertices of the hierarchy"""
+        return len(self._rank)
+
+    def shortcuts(self):
+        """Return the list of Shortcut edges added by the contraction (empty for a loaded hierarchy)"""
+        return self._shortcuts
+
+    def _id(self, v):
+        """Return the id of vertex v (of its element for a loaded hierarchy)"""
+        if self._index is None:
+            self._index = {x: i for i, x in enumerate(self._vertices)}
+        return self._index[v]
+
+    def rank(self, v):
+        """Return the contraction rank of vertex v, 0 for the first contracted vertex"""
+        return self._rank[self._id(v)]
+
+    def _search(self, s, t):
+        """Run the bidirectional upward search and return (distance, meeting id, forward parents, backward parents)"""
+        arcs = (self._up, self._down)
+        dist = ({s: 0.0}, {t: 0.0})
+        parent = ({}, {})  # parent[side][y] = (x, i), x being the vertex whose arc i reached y
+        heaps = ([(0.0, s)], [(0.0, t)])
+        best, meet = (0.0, s) if s == t else (INF, -1)
+        while heaps[0] or heaps[1]:
+            side = 0 if heaps[0] and (not heaps[1] or heaps[0][0][0] <= heaps[1][0][0]) else 1
+            k, x = heappop(heaps[side])
+            if k >= best:
+                heaps[side].clear()  # nothing shorter can be found from this side
+                continue
+            if k > dist[side][x]:
+                continue
+            offsets, targets, lengths, _ = arcs[side]
+            mine, other = dist[side], dist[1 - side]
+            back_offsets, back_targets, back_lengths, _ = arcs[1 - side]
+            if any(mine.get(back_targets[i], INF) + back_lengths[i] < k
+                   for i in range(back_offsets[x], back_offsets[x + 1])):
+                continue  # stalled: a higher vertex reaches x by a shorter path, which the search will follow
+            for i in range(offsets[x], offsets[x + 1]):
+                y = targets[i]
+                d = k + lengths[i]
+                if d < mine.get(y, INF):
+                    mine[y] = d
+                    parent[side][y] = (x, i)
+                    heappush(heaps[side], (d, y))
+                    if y in other and d + other[y] < best:
+                        best, meet = d + other[y], y
+        return best, meet, parent
+
+    def distance(self, u, v):
+        """Return the length of a shortest path from u to v, inf if there is none"""
+        return self._search(self._id(u), self._id(v))[0]
+
+    def _arc(self, a, b):
+        """Return the via of the arc a -> b, found in the lists of whichever endpoint has the lower rank"""
+        if self._rank[a] < self._rank[b]:
+            offsets, targets, _, via = self._up
+            x, y = a, b
+        else:
+            offsets, targets, _, via = self._down
+            x, y = b, a
+        for i in range(offsets[x], offsets[x + 1]):
+            if targets[i] == y:
+                return via[i]
+        raise KeyError((a, b))
+
+    def shortest_path(self, u, v):
+        """
+        Return a pair (length, vertices) of a shortest path from u to v, with the shortcuts unpacked into the
+        original vertices, or (inf, None) if there is none.
+        """
+        s, t = self._id(u), self._id(v)
+        best, meet, parent = self._search(s, t)
+        if meet < 0:
+            return INF, None
+        hops = []  # (a, b, via) arcs of the path in the hierarchy
+        y = meet
+        while y != s:
+            x, i = parent[0][y]
+            hops.append((x, y, self._up[3][i]))
+            y = x
+        hops.reverse()
+        y = meet
+        while y != t:
+            x, i = parent[1][y]
+            hops.append((y, x, self._down[3][i]))
+            y = x
+
+        path = [s]
+        for a, b, via in hops:
+            stack = [(a, b, via)]
+            while stack:
+                a, b, via = stack.pop()
+                if via < 0:
+                    path.append(b)
+                else:  # expand a -> via first, then via -> b
+                    stack.append((via, b, self._arc(via, b)))
+                    stack.append((a, via, self._arc(a, via)))
+        return best, [self._vertices[i] for i in path]
+
+    def save(self, path):
+        """
+        Write the hierarchy to a binary file that load maps back in.
+
+        The file is a fixed header, the rank array and the CSR arrays of the upward and downward arcs in
+        native byte order, then the vertex elements pickled at the end.
+        """
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, 1, len(self._rank), len(self._up[1]), len(self._down[1])))
+            for buffer in (self._rank, *self._up, *self._down):
+                f.write(memoryview(buffer).cast("B"))
+            pickle.dump([v.element() if isinstance(v, Vertex) else v for v in self._vertices], f,
+                        pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-map a hierarchy written by save; vertices are then the elements of the original vertices, which
+        must be distinct. Call close() to unmap the file. The elements are unpickled, so only load trusted files.
+        """
+        with open(path, "rb") as f:
+            block = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, mark, n, up, down = HEADER.unpack_from(block)
+        if magic != MAGIC or mark != 1:
+            block.close()
+            raise ValueError(f"{path} is not a contraction hierarchy for this machine")
+        base = memoryview(block)
+        sizes = [(n, "q")] + [(n + 1, "q"), (up, "q"), (up, "d"), (up, "q")] + \
+            [(n + 1, "q"), (down, "q"), (down, "d"), (down, "q")]
+        views, buffers = [], []
+        position = HEADER.size
+        for count, code in sizes:
+            views.append(base[position:position + 8 * count])
+            buffers.append(views[-1].cast(code))
+            position += 8 * count
+        ch = cls()
+        ch._rank = buffers[0]
+        ch._up = tuple(buffers[1:5])
+        ch._down = tuple(buffers[5:9])
+        ch._vertices = pickle.loads(block[position:])
+        ch._mapped = (block, buffers + views + [base])
+        return ch
+
+    def close(self):
+        """Unmap the file of a loaded hierarchy"""
+        if self._mapped is not None:
+            block, views = self._mapped
+            self._mapped = None
+            for view in views:
+                view.release()
+            block.close()
+
+
+if __name__ == "__main__":
+    g = Graph()
+    a = g.insert_vertex("a")
+    b = g.insert_vertex("b")
+    c = g.insert_vertex("c")
+    d = g.insert_vertex("d")
+    e = g.insert_vertex("e")
+
+    g.insert_edge(a, b, 4)
+    g.insert_edge(a, c, 1)
+    g.insert_edge(c, b, 1)
+    g.insert_edge(b, d, 1)
+    g.insert_edge(c, e, 5)
+    g.insert_edge(d, e, 1)
+
+    ch = ContractionHierarchy(g)
+    print(ch.shortest_path(a, e))  # (4.0, [a, c, b, d, e])
+    print(sorted(g.vertices(), key=ch.rank))  # contraction order: [a, e, d, c, b]
+    print(len(ch.shortcuts()))  # 0: every path around a contracted vertex has a witness
+
+    # benchmark: queries on a road-like graph, plain Dijkstra vs the hierarchy
+    from generators import random_geometric_graph
+
+    dijkstra = importlib.import_module("shortest-path").dijkstra
+    road = random_geometric_graph(20000, radius=math.sqrt(4.5 / (math.pi * 20000)), seed=24)  # degree ~4.5
+    print(f"road graph: {road.vertex_count()} vertices, {road.edge_count()} edges")  # 20000 vertices, 44442 edges
+    start = time.perf_counter()
+    ch = ContractionHierarchy(road)
+    print(f"{'preprocessing':>20}: {time.perf_counter() - start:.2f} s, {len(ch.shortcuts())} shortcuts")  # ~16 s, 30580
+    rnd = random.Random(24)
+    vertices = list(road.vertices())
+    pairs = [(rnd.choice(vertices), rnd.choice(vertices)) for _ in range(100)]
+    start = time.perf_counter()
+    expected = [dijkstra(road, s, targets=[t])[0].get(t, INF) for s, t in pairs]
+    print(f"{'dijkstra per query':>20}: {(time.perf_counter() - start) / len(pairs) * 1000:.2f} ms")  # ~56 ms
+    start = time.perf_counter()
+    found = [ch.distance(s, t) for s, t in pairs]
+    print(f"{'hierarchy per query':>20}: {(time.perf_counter() - start) / len(pairs) * 1000:.2f} ms")  # ~0.3 ms
+    assert all(x == y or abs(x - y) < 1e-9 for x, y in zip(found, expected))
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "road.ch")
+        ch.save(path)
+        start = time.perf_counter()
+        loaded = ContractionHierarchy.load(path)
+        print(f"{'load':>20}: {(time.perf_counter() - start) * 1000:.2f} ms, {os.path.getsize(path)} bytes")  # ~16 ms
+        s, t = pairs[0]
+        assert loaded.distance(s.element(), t.element()) == found[0]
+        loaded.close()
@@ -0,0 +1,353 @@
+from array import array
+from collections.abc import Iterable
+from multiprocessing import shared_memory
+
+from base import Graph, Edge
+
+
+class CSRGraph:
+    """
+    Read-only graph stored in compressed sparse row (CSR) form.
+
+    Vertices are the integers 0, 1, ..., n-1. The outgoing edges of vertex v are
+    targets[offsets[v]:offsets[v + 1]] with the matching entries of weights, so the
+    whole structure costs three flat buffers instead of one dictionary and one Edge
+    object per edge. An undirected edge is stored once in each direction and weights
+    are stored as floats.
+
+    The class supports the read-only part of the Graph ADT, so traversal, shortest path,
+    spanning tree and topological sort functions accept it in place of a Graph.
+    """
+    __slots__ = "_directed", "_m", "_offsets", "_targets", "_weights", "_vertices", "_index", \
+        "_in_degree", "_transposed", "_shm"
+
+    def __init__(self, offsets, targets, weights=None, directed=False, edge_count=None, vertices=None):
+        """
+        Wrap existing CSR buffers, prefer from_graph, from_edges or from_arrays.
+
+        :param offsets: n + 1 row offsets into targets
+        :param targets: destination vertex of each stored edge
+        :param weights: weight of each stored edge, or None for an unweighted graph
+        :param directed: True if the graph is directed
+        :param edge_count: number of edges (defaults to the number of stored entries)
+        :param vertices: optional sequence mapping each integer id to the original vertex
+        """
+        if len(offsets) == 0 or offsets[-1] != len(targets):
+            raise ValueError("offsets do not match targets")
+        if weights is not None and len(weights) != len(targets):
+            raise ValueError("weights do not match targets")
+        self._directed = directed
+        self._m = len(targets) if edge_count is None else edge_count
+        self._offsets = offsets
+        self._targets = targets
+        self._weights = weights
+        self._vertices = vertices
+        self._index = None
+        self._in_degree = None
+        self._transposed = None
+        self._shm = None  # (block, views) when the buffers live in shared memory or in a memory-mapped file
+
+    @classmethod
+    def from_arrays(cls, n, sources, targets, weights=None, directed=False, vertices=None):
+        """
+        Build a CSR graph on vertices 0..n-1 from parallel edge arrays with a counting sort.
+
+        Duplicate edges are kept, unlike Graph.insert_edge which overwrites them.
+
+        :param n: number of vertices
+        :param sources: origin of each edge
+        :param targets: destination of each edge
+        :param weights: weight of each edge, or None for an unweighted graph
+        :param directed: True if the graph is directed
+        :param vertices: optional sequence mapping each integer id to the original vertex
+        :return: a CSRGraph
+        """
+        m = len(sources)
+        if len(targets) != m or (weights is not None and len(weights) != m):
+            raise ValueError("edge arrays must have the same length")
+
+        offsets = array("q", bytes(8 * (n + 1)))
+        for i in range(m):
+            u, v = sources[i], targets[i]
+            if not (0 <= u < n and 0 <= v < n):
+                raise ValueError(f"edge ({u}, {v}) out of range")
+            offsets[u + 1] += 1
+            if not directed and u != v:
+                offsets[v + 1] += 1
+        for v in range(n):
+            offsets[v + 1] += offsets[v]
+
+        size = offsets[n]
+        adj = array("q", bytes(8 * size))
+        wts = array("d", bytes(8 * size)) if weights is not None else None
+        free = offsets[:n]  # next free slot of each row
+        for i in range(m):
+            u, v = sources[i], targets[i]
+            j = free[u]
+            free[u] = j + 1
+            adj[j] = v
+            if wts is not None:
+                wts[j] = weights[i]
+            if not directed and u != v:
+                j = free[v]
+                free[v] = j + 1
+                adj[j] = u
+                if wts is not None:
+                    wts[j] = weights[i]
+
+        return cls(offsets, adj, wts, directed, m, vertices)
+
+    @classmethod
+    def from_edges(cls, edges: Iterable, n=None, directed=False, vertices=None):
+        """
+        Build a CSR graph from an iterable of (u, v) or (u, v, weight) tuples of integer ids.
+
+        The two forms can be mixed: like in from_graph, a missing or None weight is stored as 1.0 and
+        the graph is unweighted only if no edge has a weight.
+        :param edges: iterable of edge tuples
+        :param n: number of vertices (defaults to the largest id plus one)
+        :param directed: True if the graph is directed
+        :param vertices: optional sequence mapping each integer id to the original vertex
+        :return: a CSRGraph
+        """
+        sources = array("q")
+        targets = array("q")
+        weights = array("d")
+        weighted = False
+        for edge in edges:
+            sources.append(edge[0])
+            targets.append(edge[1])
+            w = edge[2] if len(edge) > 2 else None
+            if w is None:
+                weights.append(1.0)
+            else:
+                weights.append(w)
+                weighted = True
+        if n is None:
+            n = max(max(sources, default=-1), max(targets, default=-1)) + 1
+        return cls.from_arrays(n, sources, targets, weights if weighted else None, directed, vertices)
+
+    @classmethod
+    def from_graph(cls, g: Graph):
+        """
+        Build a CSR snapshot of graph g. Vertex i of the result is vertex(i) of g.
+
+        Edge elements are used as weights, an element that is None being stored as 1.0 like in an indexed
+        Graph. The snapshot is unweighted only if every element is None.
+        """
+        vertices = list(g.vertices())
+        index = {v: i for i, v in enumerate(vertices)}
+        offsets = array("q", [0])
+        targets = array("q")
+        weights = array("d")
+        weighted = False
+        for v in vertices:
+            for e in g.incident_edges(v):
+                targets.append(index[e.opposite(v)])
+                w = e.element()
+                if w is None:
+                    weights.append(1.0)
+                else:
+                    weights.append(w)
+                    weighted = True
+            offsets.append(len(targets))
+        if not weighted:
+            weights = None
+
+        csr = cls(offsets, targets, weights, g.is_directed(), g.edge_count(), vertices)
+        csr._index = index
+        return csr
+
+    def is_directed(self):
+        """Returns True if the graph is directed"""
+        return self._directed
+
+    def is_indexed(self):
+        """Returns False: vertices are plain integer ids, not Vertex objects with an index"""
+        return False
+
+    def vertex_count(self):
+        """Returns the number of vertices in the graph"""
+        return len(self._offsets) - 1
+
+    def vertices(self) -> Iterable[int]:
+        """Return an iteration of all vertices in the graph"""
+        return range(len(self._offsets) - 1)
+
+    def edge_count(self):
+        """Return the number of edges in the graph"""
+        return self._m
+
+    def edges(self) -> Iterable[Edge]:
+        """Return an iteration of all edges of the graph, each undirected edge once"""
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        for u in range(len(offsets) - 1):
+            for i in range(offsets[u], offsets[u + 1]):
+                v = targets[i]
+                if self._directed or u <= v:
+                    yield Edge(u, v, None if weights is None else weights[i])
+
+    def get_edge(self, u, v) -> Edge:
+        """Return the edge from u to v or None if there is no adjacent"""
+        targets = self._targets
+        for i in range(self._offsets[u], self._offsets[u + 1]):
+            if targets[i] == v:
+                return Edge(u, v, None if self._weights is None else self._weights[i])
+        return None
+
+    def degree(self, v, outgoing=True):
+        """Returns the number of (outgoing) edges incident to vertex v in the graph
+        If graph is directed, optional parameter used to count incoming edges.
+        """
+        if outgoing or not self._directed:
+            return self._offsets[v + 1] - self._offsets[v]
+        if self._in_degree is None:
+            in_degree = array("q", bytes(8 * self.vertex_count()))
+            for t in self._targets:
+                in_degree[t] += 1
+            self._in_degree = in_degree
+        return self._in_degree[v]
+
+    def neighbors(self, v):
+        """Return the range of positions of the outgoing edges of v in the targets and weights buffers"""
+        return range(self._offsets[v], self._offsets[v + 1])
+
+    def incident_edges(self, v, outgoing=True, **kwargs) -> Iterable[Edge]:
+        """Return all (outgoing) edges incident to vertex v in the graph
+        If graph is directed, optional parameter used to request incoming edges.
+        Edges are created on the fly; incoming edges keep their original orientation.
+        """
+        incoming = not outgoing and self._directed
+        source = self.transpose() if incoming else self
+        targets, weights = source._targets, source._weights
+        positions = range(source._offsets[v], source._offsets[v + 1])
+        if kwargs.get("sorted") and weights is not None:
+            positions = sorted(positions, key=weights.__getitem__, reverse=kwargs.get("reverse", False))
+        for i in positions:
+            w = None if weights is None else weights[i]
+            yield Edge(targets[i], v, w) if incoming else Edge(v, targets[i], w)
+
+    def transpose(self) -> "CSRGraph":
+        """Return the graph with every edge reversed; computed once and cached"""
+        if not self._directed:
+            return self
+        if self._transposed is None:
+            n = self.vertex_count()
+            sources = array("q", bytes(8 * len(self._targets)))
+            for u in range(n):
+                for i in range(self._offsets[u], self._offsets[u + 1]):
+                    sources[i] = u
+            t = CSRGraph.from_arrays(n, self._targets, sources, self._weights, True, self._vertices)
+            t._index = self._index
+            t._transposed = self
+            self._transposed = t
+        return self._transposed
+
+    def vertex(self, i):
+        """Return the original vertex with integer id i (or i itself if there is none)"""
+        return i if self._vertices is None else self._vertices[i]
+
+    def vertex_map(self):
+        """Return the sequence mapping each integer id to the original vertex, None if the vertices are plain ids"""
+        return self._vertices
+
+    def index(self, v):
+        """Return the integer id of original vertex v"""
+        if self._vertices is None:
+            return v
+        if self._index is None:
+            self._index = {x: i for i, x in enumerate(self._vertices)}
+        return self._index[v]
+
+    def csr_arrays(self):
+        """Return the (offsets, targets, weights) buffers; weights is None for an unweighted graph"""
+        return self._offsets, self._targets, self._weights
+
+    @staticmethod
+    def _map_block(block, n, size, weighted):
+        """Return the (offsets, targets, weights) views of a shared memory block and every view to release"""
+        base = block.buf
+        views = [base[:8 * (n + 1)], base[8 * (n + 1):8 * (n + 1 + size)]]
+        if weighted:
+            views.append(base[8 * (n + 1 + size):8 * (n + 1 + 2 * size)])
+        buffers = [views[0].cast("q"), views[1].cast("q"), views[2].cast("d") if weighted else None]
+        return buffers, [b for b in buffers if b is not None] + views
+
+    def to_shared_memory(self) -> "CSRGraph":
+        """
+        Return a copy of this graph whose buffers live in a new shared memory block.
+
+        Other processes map the same block without copying it through CSRGraph.attach(shared.descriptor()).
+        The creator must call close(unlink=True) once no process needs the graph anymore.
+        """
+        n, size, weighted = self.vertex_count(), len(self._targets), self._weights is not None
+        block = shared_memory.SharedMemory(create=True, size=8 * (n + 1 + size * (2 if weighted else 1)))
+        (offsets, targets, weights), views = CSRGraph._map_block(block, n, size, weighted)
+        offsets[:] = memoryview(self._offsets).cast("B").cast("q")
+        targets[:] = memoryview(self._targets).cast("B").cast("q")
+        if weighted:
+            weights[:] = memoryview(self._weights).cast("B").cast("d")
+        shared = CSRGraph(offsets, targets, weights, self._directed, self._m, self._vertices)
+        shared._index = self._index
+        shared._shm = (block, views)
+        return shared
+
+    def descriptor(self):
+        """Return a picklable description of a shared memory graph, to pass to CSRGraph.attach"""
+        if self._shm is None or not isinstance(self._shm[0], shared_memory.SharedMemory):
+            raise ValueError("graph is not in shared memory")
+        return (self._shm[0].name, self.vertex_count(), len(self._targets), self._weights is not None,
+                self._directed, self._m)
+
+    @classmethod
+    def attach(cls, descriptor) -> "CSRGraph":
+        """Map the shared memory graph described by descriptor (vertex ids only, no original vertices)"""
+        name, n, size, weighted, directed, edge_count = descriptor
+        block = shared_memory.SharedMemory(name=name)
+        (offsets, targets, weights), views = CSRGraph._map_block(block, n, size, weighted)
+        csr = cls(offsets, targets, weights, directed, edge_count)
+        csr._shm = (block, views)
+        return csr
+
+    def close(self, unlink=False):
+        """Release the shared memory (or file) mapping of this graph, and destroy the block if unlink is True"""
+        if self._shm is not None:
+            block, views = self._shm
+            self._shm = None
+            for view in views:
+                view.release()
+            block.close()
+            if unlink:
+                block.unlink()
+
+    def nbytes(self):
+        """Return the number of bytes used by the CSR buffers"""
+        total = 0
+        for buffer in (self._offsets, self._targets, self._weights):
+            if buffer is not None:
+                total += len(buffer) * buffer.itemsize
+        return total
+
+
+if __name__ == "__main__":
+    g = Graph(directed=True)
+    v1 = g.insert_vertex(1)
+    v2 = g.insert_vertex(2)
+    v3 = g.insert_vertex(3)
+    v4 = g.insert_vertex(4)
+    v5 = g.insert_vertex(5)
+
+    g.insert_edge(v1, v3, 1)
+    g.insert_edge(v2, v1, 5)
+    g.insert_edge(v3, v2, 2)
+    g.insert_edge(v1, v4, 4)
+    g.insert_edge(v4, v5, 3)
+
+    csr = CSRGraph.from_graph(g)
+    print(list(csr.edges()))  # [0 -> 2, 0 -> 3, 1 -> 0, 2 -> 1, 3 -> 4]
+    print([csr.vertex(i) for i in csr.vertices()])  # [1, 2, 3, 4, 5]
+    print(list(csr.incident_edges(0, False)))  # [1 -> 0]
+    print(csr.nbytes(), "bytes")
+
+    ring = CSRGraph.from_edges(((i, (i + 1) % 6, 1.0) for i in range(6)))
+    print(ring.vertex_count(), ring.edge_count(), ring.degree(0))  # 6 6 2
@@ -1,34 +1,33 @@
+from array import array
+
 from base import Vertex, Edge, Graph
+from csr_graph import CSRGraph
+from traversal import depth_first, walk_back
 
 
 def simpleDFS(g: Graph, u: Vertex, discovered):
     """
     Perform simpleDFS of the undiscovered portion of the graph g starting at vertex u.
+    The traversal uses an explicit stack, so it works on paths longer than the recursion limit.
 
     :param g: Graph
-    :param u: Vertex
+    :param u: Vertex, already in discovered
     :param discovered: dictionary mapping each vertex to the edge that was used to discover it.
     :return: None
     """
-    for e in g.incident_edges(u):
-        v = e.opposite(u)
-        if discovered[v] is None:
-            discovered[v] = e
-            simpleDFS(g, v, discovered)
+    mark = discovered.pop(u, None)  # let the traversal start from u again
+    depth_first(g, [u], discovered=discovered)
+    discovered[u] = mark
 
 
 def simpleDFS_2(g, u, v, discovered):
     """Same as above but this time we check if there's a path between two vertices in the graph."""
-    if u == v:  # base.py case: we have reached the destination vertex
+    if u == v:  # we have reached the destination vertex
         return True
-    for e in g.incident_edges(u):
-        x = e.opposite(u)
-        if not discovered.get(x, False):
-            discovered[x] = True
-            if simpleDFS_2(g, x, v, discovered):
-                # second base.py case destination vertex is the last visited vertex
-                return True
-    return False
+    mark = discovered.pop(u, None)
+    depth_first(g, [u], pre=lambda x, e: x == v, discovered=discovered)  # stop once v is discovered
+    discovered[u] = mark
+    return v in discovered
 
 
 def path(g, u, v):
@@ -42,22 +41,15 @@ def reconstruct_path(u, v, discovered):
     discovered looks like this: {1: None, 2: 1 -> 2, 4: 2 -> 4, 15: 4 -> 15, 8: 8 -> 15, 6: 15 -> 6, 7: 6 -> 7}
 
     for example if u=1 v=7
-    we can walk from 7 to 1 which is the path from 1 to 7
+    we can walk from 7 to 1 which is the path from 1 to 7.
+    Returns None if v was not discovered and False if u is not on the way back from v.
     """
-    path = []
-    try:
-        if v in discovered:
-            path.append(v)
-            walk = v
-            while walk != u:
-                e = discovered[walk]
-                parent = e.opposite(walk)
-                path.append(parent)
-                walk = parent
-            path.reverse()
-            return path
-    except:
+    if v not in discovered:
+        return None
+    path = walk_back(discovered, v)
+    if u not in path:
         return False
+    return path[path.index(u):]
 
 
 def simpleDFS_complete(g: Graph):
@@ -65,55 +57,102 @@ def simpleDFS_complete(g: Graph):
 
     Result maps each vertex to the edge that was used to discover it.
     (Vertices that are roots of a simpleDFS tree are mapped to None)."""
-    forest = {}
-    for u in g.vertices():
-        if u not in forest:
-            forest[u] = None
-            simpleDFS(g, u, forest)
-    return forest
+    return depth_first(g)
 
 
 def findSCC(g: Graph):
-    """This algorithms runs in O(n**3) where n is the number of vertices"""
-    result = []
+    """Return the strongly connected components of g as lists of vertices, in topological order of
+    the condensation. This runs in O(n+m) where n is the number of vertices and m the number of edges"""
+    comp, count = tarjan_scc(g)
+    result = [[] for _ in range(count)]
+    for v, c in comp.items():
+        result[count - 1 - c].append(v)
+    return result
 
-    is_scc = {u: False for u in g.vertices()}
 
-    for u in g.vertices():
+def tarjan_scc(g: Graph):
+    """
+    Number the strongly connected components of g with Tarjan's algorithm, without recursion.
 
-        if not is_scc[u]:
+    Each vertex is pushed once on an explicit stack of (vertex, edge iterator) pairs, so the running time
+    is O(n + m) and the depth of the graph is not limited by Python's recursion limit. Components are
+    numbered in the order Tarjan's algorithm completes them, which is a reverse topological order of
+    the condensation: every edge leaves a component for one with a smaller number.
 
-            scc = [u]
-            for v in g.vertices():
+    :param g: Graph
+    :return: a pair (comp, count) where comp maps each vertex to its component number
+    """
+    comp = {}
+    low = {}
+    order = {}
+    stack = []  # vertices of the components that are not complete yet
+    count = 0
+    for root in g.vertices():
+        if root in order:
+            continue
+        order[root] = low[root] = len(order)
+        stack.append(root)
+        work = [(root, iter(g.incident_edges(root)))]
+        while work:
+            u, edges = work[-1]
+            for e in edges:
+                v = e.opposite(u)
+                if v not in order:
+                    order[v] = low[v] = len(order)
+                    stack.append(v)
+                    work.append((v, iter(g.incident_edges(v))))
+                    break
+                if v not in comp and order[v] < low[u]:
+                    low[u] = order[v]
+            else:
+                work.pop()
+                if work and low[u] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[u]
+                if low[u] == order[u]:  # u is the root of a component
+                    while True:
+                        v = stack.pop()
+                        comp[v] = count
+                        if v == u:
+                            break
+                    count += 1
+    return comp, count
+
+
+def condensation(g: Graph, comp=None, count=None) -> CSRGraph:
+    """
+    Return the condensation of g: the DAG with one vertex per strongly connected component and an
+    edge (c, d) whenever some edge of g goes from component c to component d. Runs in O(n + m).
 
-                if v is not u and path(g, u, v) and path(g, v, u):
-                    scc.append(v)
-                    is_scc[v] = True
-            result.append(scc)
-    return result
+    :param g: Graph
+    :param comp: optional map from vertex to component number, as returned by tarjan_scc
+    :param count: number of components, required with comp
+    :return: a directed CSRGraph whose vertex ids are the component numbers
+    """
+    if comp is None:
+        comp, count = tarjan_scc(g)
+    members = [[] for _ in range(count)]
+    for v, c in comp.items():
+        members[c].append(v)
+
+    offsets = array("q", [0])
+    targets = array("q")
+    seen = array("q", [-1]) * count  # seen[d] == c once edge (c, d) has been added
+    for c in range(count):
+        for u in members[c]:
+            for e in g.incident_edges(u):
+                d = comp[e.opposite(u)]
+                if d != c and seen[d] != c:
+                    seen[d] = c
+                    targets.append(d)
+        offsets.append(len(targets))
+    return CSRGraph(offsets, targets, None, True)
 
 
 def kosarajuSCC(g: Graph, u):
     """Check whether a graph is strongly connected or not. This runs in O(n+m) where n
     is the number of vertices in the graph and m is the number of edges"""
-
-    discov1 = {x: None for x in g.vertices()}
-    simpleDFS(g, u, discov1)
-    print(discov1)
-    n = sum(1 for x in discov1 if discov1[x] is None)
-    if n != 0:
-        return False
-
-    gT = g.transpose()
-
-    discov2 = {x: None for x in g.vertices()}
-    simpleDFS(gT, u, discov2)
-    print(discov2)
-    n = sum(1 for x in discov2 if discov2[x] is None)
-    if n != 0:
-        return False
-
-    return True
+    n = g.vertex_count()
+    return len(depth_first(g, [u])) == n and len(depth_first(g.transpose(), [u])) == n
 
 
 if __name__ == '__main__':
@@ -141,3 +180,6 @@ if __name__ == '__main__':
 
     print("strongly connected components: ", findSCC(g))
     print("Is g strongly connected", kosarajuSCC(g, v1))
+    comp, count = tarjan_scc(g)
+    print("component of each vertex: ", comp)  # {5: 0, 4: 1, 2: 2, 3: 2, 1: 2}
+    print("condensation: ", list(condensation(g, comp, count).edges()))  # [1 -> 0, 2 -> 1]
@@ -0,0 +1,228 @@
+import math
+import random
+
+from base import Graph
+
+
+def random_geometric_graph(n, radius=None, seed=None, directed=False) -> Graph:
+    """
+    Generate a random geometric graph, a simple model of a road network.
+
+    n points are drawn uniformly in the unit square and every pair closer than radius is
+    joined by an edge weighted by the euclidean distance. The element of each vertex is its
+    (x, y) position. A directed graph gets one edge in each direction.
+
+    :param n: number of vertices
+    :param radius: connection radius, by default chosen for an average degree of about 8
+    :param seed: seed of the random generator
+    :param directed: True to build a directed graph
+    :return: a Graph
+    """
+    rnd = random.Random(seed)
+    if radius is None:
+        radius = math.sqrt(8 / (math.pi * max(n, 1)))
+    g = Graph(directed)
+    cells = {}  # bucket the points in a grid of radius x radius cells
+    for _ in range(n):
+        v = g.insert_vertex((rnd.random(), rnd.random()))
+        x, y = v.element()
+        cells.setdefault((int(x / radius), int(y / radius)), []).append(v)
+
+    for (cx, cy), bucket in cells.items():
+        for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):  # each pair of cells once
+            other = cells.get((cx + dx, cy + dy))
+            if other is None:
+                continue
+            for i, u in enumerate(bucket):
+                for v in (bucket[i + 1:] if other is bucket else other):
+                    w = math.dist(u.element(), v.element())
+                    if w < radius:
+                        g.insert_edge(u, v, w)
+                        if directed:
+                            g.insert_edge(v, u, w)
+    return g
+
+
+def erdos_renyi_graph(n, m, seed=None, directed=False) -> Graph:
+    """
+    Generate a uniform random graph with n vertices and m distinct edges, the G(n, m) model of Erdos and Renyi.
+
+    Edges get random weights in [0, 1) and the element of vertex i is i. There are no self-loops.
+
+    :param n: number of vertices
+    :param m: number of edges, at most n(n - 1) / 2 (n(n - 1) if directed)
+    :param seed: seed of the random generator
+    :param directed: True to build a directed graph
+    :return: a Graph
+    """
+    if m > n * (n - 1) // (1 if directed else 2):
+        raise ValueError("too many edges")
+    rnd = random.Random(seed)
+    g = Graph(directed)
+    vertices = [g.insert_vertex(i) for i in range(n)]
+    while g.edge_count() < m:
+        u, v = rnd.choice(vertices), rnd.choice(vertices)
+        if u is not v and g.get_edge(u, v) is None:
+            g.insert_edge(u, v, rnd.random())
+    return g
+
+
+def barabasi_albert_graph(n, k, seed=None) -> Graph:
+    """
+    Generate a scale-free undirected graph by preferential attachment, the model of Barabasi and Albert.
+
+    Each new vertex is joined to k distinct earlier vertices chosen with a probability proportional to their
+    degree, which gives a few hubs of very high degree like in social or web graphs. Vertex i has element i
+    and edges get random weights in [0, 1).
+
+    :param n: number of vertices
+    :param k: number of edges of each new vertex
+    :param seed: seed of the random generator
+    :return: a Graph
+    """
+    rnd = random.Random(seed)
+    g = Graph()
+    vertices = [g.insert_vertex(i) for i in range(n)]
+    ends = []  # every endpoint of every edge, so a uniform pick is proportional to the degree
+    for i in range(min(k, n), n):
+        targets = set()
+        while len(targets) < k:
+            targets.add(rnd.choice(ends) if ends else rnd.randrange(i))
+        for j in targets:
+            g.insert_edge(vertices[i], vertices[j], rnd.random())
+            ends.append(i)
+            ends.append(j)
+    return g
+
+
+def grid_graph(rows, columns, seed=None, directed=False) -> Graph:
+    """
+    Generate a rows x columns grid graph, vertex (i, j) being joined to its four neighbors by edges with
+    random weights in [0, 1). A directed graph gets one edge in each direction.
+
+    :return: a Graph
+    """
+    rnd = random.Random(seed)
+    g = Graph(directed)
+    grid = [[g.insert_vertex((i, j)) for j in range(columns)] for i in range(rows)]
+    for i in range(rows):
+        for j in range(columns):
+            for a, b in ((i, j + 1), (i + 1, j)):
+                if a < rows and b < columns:
+                    g.insert_edge(grid[i][j], grid[a][b], rnd.random())
+                    if directed:
+                        g.insert_edge(grid[a][b], grid[i][j], rnd.random())
+    return g
+
+
+def random_dag(n, m, seed=None) -> Graph:
+    """
+    Generate a random directed acyclic graph with n vertices and m distinct edges, each going from a smaller
+    to a larger vertex element, with random weights in [0, 1). Vertices are inserted in a random order, so
+    the insertion order is not a topological order.
+
+    :param n: number of vertices
+    :param m: number of edges, at most n(n - 1) / 2
+    :param seed: seed of the random generator
+    :return: a directed Graph
+    """
+    if m > n * (n - 1) // 2:
+        raise ValueError("too many edges")
+    rnd = random.Random(seed)
+    g = Graph(directed=True)
+    order = list(range(n))
+    rnd.shuffle(order)
+    vertices = [None] * n
+    for i in order:
+        vertices[i] = g.insert_vertex(i)
+    while g.edge_count() < m:
+        a, b = rnd.randrange(n), rnd.randrange(n)
+        if a != b:
+            u, v = vertices[min(a, b)], vertices[max(a, b)]
+            if g.get_edge(u, v) is None:
+                g.insert_edge(u, v, rnd.random())
+    return g
+
+
+def random_bipartite_graph(left, right, degree=3, max_cost=100, seed=None):
+    """
+    Generate a random bipartite graph, a simple model of workers and the jobs they can do.
+
+    Left vertex i is joined to right vertex i % right and to degree - 1 other random right vertices, so a
+    matching covering the smaller side always exists. Costs are random integers in 1..max_cost. The elements
+    of the vertices are ("L", i) and ("R", j).
+
+    :return: a triple (g, left_vertices, right_vertices) of an undirected Graph and the lists of its two sides
+    """
+    rnd = random.Random(seed)
+    g = Graph()
+    workers = [g.insert_vertex(("L", i)) for i in range(left)]
+    jobs = [g.insert_vertex(("R", j)) for j in range(right)]
+    for i, u in enumerate(workers):
+        chosen = {i % right}
+        while len(chosen) < min(degree, right):
+            chosen.add(rnd.randrange(right))
+        for j in chosen:
+            g.insert_edge(u, jobs[j], rnd.randint(1, max_cost))
+    return g, workers, jobs
+
+
+def layered_network(layers, width, degree=3, max_capacity=100, seed=None):
+    """
+    Generate a random layered flow network, the usual worst case shape for augmenting path algorithms.
+
+    A source feeds every vertex of the first of layers layers of width vertices, each vertex has degree
+    edges to random vertices of the next layer, and the last layer feeds a sink. Capacities are random
+    integers in 1..max_capacity.
+
+    :return: a triple (g, s, t) of a directed Graph, its source and its sink
+    """
+    rnd = random.Random(seed)
+    g = Graph(directed=True)
+    s = g.insert_vertex("s")
+    t = g.insert_vertex("t")
+    previous = [g.insert_vertex((0, i)) for i in range(width)]
+    for v in previous:
+        g.insert_edge(s, v, rnd.randint(1, max_capacity))
+    for layer in range(1, layers):
+        current = [g.insert_vertex((layer, i)) for i in range(width)]
+        for u in previous:
+            for v in rnd.sample(current, min(degree, width)):
+                g.insert_edge(u, v, rnd.randint(1, max_capacity))
+        previous = current
+    for u in previous:
+        g.insert_edge(u, t, rnd.randint(1, max_capacity))
+    return g, s, t
+
+
+def grid_network(rows, columns, max_capacity=100, seed=None):
+    """
+    Generate a grid flow network, a simple model of image segmentation and planar transport problems.
+
+    Vertex (i, j) has edges in both directions to its right and lower neighbors, the source feeds the
+    first column and the last column feeds the sink. Capacities are random integers in 1..max_capacity.
+
+    :return: a triple (g, s, t) of a directed Graph, its source and its sink
+    """
+    rnd = random.Random(seed)
+    g = Graph(directed=True)
+    s = g.insert_vertex("s")
+    t = g.insert_vertex("t")
+    grid = [[g.insert_vertex((i, j)) for j in range(columns)] for i in range(rows)]
+    for i in range(rows):
+        for j in range(columns):
+            for a, b in ((i, j + 1), (i + 1, j)):
+                if a < rows and b < columns:
+                    g.insert_edge(grid[i][j], grid[a][b], rnd.randint(1, max_capacity))
+                    g.insert_edge(grid[a][b], grid[i][j], rnd.randint(1, max_capacity))
+        g.insert_edge(s, grid[i][0], rnd.randint(1, max_capacity))
+        g.insert_edge(grid[i][columns - 1], t, rnd.randint(1, max_capacity))
+    return g, s, t
+
+
+if __name__ == "__main__":
+    g = random_geometric_graph(1000, seed=1)
+    print(g.vertex_count(), g.edge_count())
+    for g in (erdos_renyi_graph(1000, 4000, seed=1), barabasi_albert_graph(1000, 4, seed=1), grid_graph(30, 30, seed=1),
+              random_dag(1000, 4000, seed=1)):
+        print(g.vertex_count(), g.edge_count(), max(g.degree(v) for v in g.vertices()))
@@ -0,0 +1,246 @@
+import csv
+import mmap
+import os
+import pickle
+import random
+import struct
+import tempfile
+import time
+from array import array
+
+from base import Graph, Vertex
+from csr_graph import CSRGraph
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, from_numpy falls back to CSRGraph.from_arrays
+    np = None
+
+MAGIC = b"CSRGRAPH"
+HEADER = struct.Struct("=8sqqqqqq")  # magic, byte order mark, flags, n, stored entries, edge count, labels offset
+DIRECTED, WEIGHTED, LABELED = 1, 2, 4
+
+
+def read_edge_chunks(path, delimiter=None, chunk_size=1 << 16, label=str, weight=float):
+    """
+    Read an edge list file, one "x y" or "x y weight" edge per line, as a stream of chunks.
+
+    Lines that are empty or start with # are skipped. Only chunk_size edges are in memory at
+    a time, so the file can be larger than the memory; graph builders consume the chunks as they come.
+
+    :param path: name of the file
+    :param delimiter: field separator, by default "," for .csv files, tab for .tsv files and any whitespace otherwise
+    :param chunk_size: number of edges per chunk
+    :param label: function converting the vertex fields (for instance int)
+    :param weight: function converting the weight field
+    :return: generator of lists of (x, y) or (x, y, weight) tuples
+    """
+    if delimiter is None:
+        delimiter = {".csv": ",", ".tsv": "\t"}.get(os.path.splitext(path)[1].lower())
+    with open(path, newline="") as f:
+        rows = csv.reader(f, delimiter=delimiter) if delimiter is not None else (line.split() for line in f)
+        chunk = []
+        for row in rows:
+            if not row or row[0].startswith("#"):
+                continue
+            if len(row) > 2:
+                chunk.append((label(row[0]), label(row[1]), weight(row[2])))
+            else:
+                chunk.append((label(row[0]), label(row[1])))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def load_edge_list(path, directed=False, delimiter=None, chunk_size=1 << 16, label=str):
+    """
+    Build a CSRGraph from an edge list file, reading it in chunks.
+
+    Vertex labels get integer ids in order of first appearance and the edges are accumulated in flat
+    arrays, so memory stays around 24 bytes per edge plus one dictionary entry per vertex. Lines
+    with and without a weight can be mixed, with the rule of CSRGraph.from_edges: a missing weight
+    is stored as 1.0 and the graph is unweighted only if no line has a weight.
+    Use Graph.from_edges on the chunks of read_edge_chunks to get a mutable Graph instead.
+
+    :param path: name of the file, see read_edge_chunks for the format
+    :param directed: True if the graph is directed
+    :param delimiter: field separator, see read_edge_chunks
+    :param chunk_size: number of edges per chunk
+    :param label: function converting the vertex fields
+    :return: a CSRGraph whose vertex(i) is the label of vertex i
+    """
+    ids = {}
+    sources = array("q")
+    targets = array("q")
+    weights = array("d")
+    weighted = False
+    for chunk in read_edge_chunks(path, delimiter, chunk_size, label):
+        for edge in chunk:
+            sources.append(ids.setdefault(edge[0], len(ids)))
+            targets.append(ids.setdefault(edge[1], len(ids)))
+            if len(edge) > 2:
+                weights.append(edge[2])
+                weighted = True
+            else:
+                weights.append(1.0)
+    return CSRGraph.from_arrays(len(ids), sources, targets, weights if weighted else None, directed, list(ids))
+
+
+def from_numpy(sources, targets, weights=None, n=None, directed=False, vertices=None):
+    """
+    Build a CSRGraph on vertices 0..n-1 from NumPy arrays of edge endpoints (and weights).
+
+    The counting sort of CSRGraph.from_arrays becomes a stable argsort and a bincount, so no Python
+    loop runs over the edges. Without NumPy, falls back to CSRGraph.from_arrays.
+
+    :param sources: integer array, origin of each edge
+    :param targets: integer array, destination of each edge
+    :param weights: optional array, weight of each edge
+    :param n: number of vertices (defaults to the largest id plus one)
+    :param directed: True if the graph is directed
+    :param vertices: optional sequence mapping each integer id to the original vertex
+    :return: a CSRGraph
+    """
+    if np is None:
+        if n is None:
+            n = max(max(sources, default=-1), max(targets, default=-1)) + 1
+        return CSRGraph.from_arrays(n, sources, targets, weights, directed, vertices)
+
+    src = np.asarray(sources, dtype=np.int64)
+    dst = np.asarray(targets, dtype=np.int64)
+    wts = None if weights is None else np.asarray(weights, dtype=np.float64)
+    m = len(src)
+    if len(dst) != m or (wts is not None and len(wts) != m):
+        raise ValueError("edge arrays must have the same length")
+    if n is None:
+        n = int(max(src.max(initial=-1), dst.max(initial=-1))) + 1
+    if m and (min(src.min(), dst.min()) < 0 or max(src.max(), dst.max()) >= n):
+        raise ValueError("edge out of range")
+    if not directed:  # store each undirected edge in both rows, self-loops once
+        back = src != dst
+        src, dst = np.concatenate((src, dst[back])), np.concatenate((dst, src[back]))
+        if wts is not None:
+            wts = np.concatenate((wts, wts[back]))
+
+    order = np.argsort(src, kind="stable")
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+    return CSRGraph(array("q", offsets.tobytes()), array("q", dst[order].tobytes()),
+                    None if wts is None else array("d", wts[order].tobytes()), directed, m, vertices)
+
+
+def save_snapshot(g, path):
+    """
+    Write a CSR snapshot of g to a binary file that load_snapshot maps back in.
+
+    The file is a fixed header followed by the offsets, targets and weights buffers in native byte
+    order and, if the vertices are not plain ids, their elements pickled at the end.
+
+    :param g: a Graph or CSRGraph
+    :param path: name of the file
+    :return: None
+    """
+    csr = g if isinstance(g, CSRGraph) else CSRGraph.from_graph(g)
+    offsets, targets, weights = csr.csr_arrays()
+    n = csr.vertex_count()
+    labels = None
+    if csr.vertex_map() is not None:
+        labels = [v.element() if isinstance(v, Vertex) else v for v in csr.vertex_map()]
+    flags = (DIRECTED if csr.is_directed() else 0) | (WEIGHTED if weights is not None else 0) | \
+        (LABELED if labels is not None else 0)
+    end = HEADER.size + 8 * (n + 1 + len(targets) * (2 if weights is not None else 1))
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 1, flags, n, len(targets), csr.edge_count(), end if labels is not None else 0))
+        for buffer in (offsets, targets, weights):
+            if buffer is not None:
+                f.write(memoryview(buffer).cast("B"))
+        if labels is not None:
+            pickle.dump(labels, f, pickle.HIGHEST_PROTOCOL)
+
+
+def load_snapshot(path, labels=True):
+    """
+    Memory-map a snapshot written by save_snapshot as a read-only CSRGraph.
+
+    Nothing is parsed or copied: the buffers of the graph are views of the mapped file, and pages are
+    read from disk (or the page cache) the first time they are touched. Call close() on the result to
+    unmap the file. The vertex labels are unpickled, so only load files from a trusted source.
+
+    :param path: name of the file
+    :param labels: False to skip loading the vertex labels, vertices are then plain ids
+    :return: a CSRGraph
+    """
+    with open(path, "rb") as f:
+        block = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, mark, flags, n, size, m, labels_at = HEADER.unpack_from(block)
+    if magic != MAGIC or mark != 1:
+        block.close()
+        raise ValueError(f"{path} is not a graph snapshot for this machine")
+    base = memoryview(block)
+    bounds = [HEADER.size, HEADER.size + 8 * (n + 1), HEADER.size + 8 * (n + 1 + size)]
+    if flags & WEIGHTED:
+        bounds.append(bounds[-1] + 8 * size)
+    views = [base[lo:hi] for lo, hi in zip(bounds, bounds[1:])]
+    buffers = [views[0].cast("q"), views[1].cast("q"), views[2].cast("d") if flags & WEIGHTED else None]
+    vertices = None
+    if labels and flags & LABELED:
+        vertices = pickle.loads(block[labels_at:])
+    csr = CSRGraph(*buffers, bool(flags & DIRECTED), m, vertices)
+    csr._shm = (block, [b for b in buffers if b is not None] + views + [base])
+    return csr
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "roads.tsv")
+        with open(path, "w") as f:
+            f.write("# origin\tdestination\tkm\nparis\tlyon\t465\nlyon\tmarseille\t315\nparis\tlille\t225\n")
+
+        for chunk in read_edge_chunks(path, chunk_size=2):
+            print(chunk)  # [('paris', 'lyon', 465.0), ('lyon', 'marseille', 315.0)] then [('paris', 'lille', 225.0)]
+        g = Graph.from_edges(edge for chunk in read_edge_chunks(path) for edge in chunk)
+        print(g.vertex_count(), g.edge_count())  # 4 3
+        csr = load_edge_list(path)
+        print(csr.vertex(0), [csr.vertex(e.opposite(0)) for e in csr.incident_edges(0)])  # paris ['lyon', 'lille']
+
+        snapshot = os.path.join(folder, "roads.csrg")
+        save_snapshot(g, snapshot)
+        mapped = load_snapshot(snapshot)
+        print(sorted((mapped.vertex(u), mapped.vertex(v), w) for u, v, w in
+                     ((*e.endpoints(), e.element()) for e in mapped.edges())))
+        mapped.close()
+
+        # benchmark: build a 1M edge graph, persist it, map it back
+        n, m = 200_000, 1_000_000
+        rnd = random.Random(15)
+        big = os.path.join(folder, "big.tsv")
+        with open(big, "w") as f:
+            for _ in range(m):
+                f.write(f"{rnd.randrange(n)}\t{rnd.randrange(n)}\t{rnd.random():.6f}\n")
+        start = time.perf_counter()
+        slow = Graph()
+        nodes = {}
+        for chunk in read_edge_chunks(big, label=int):
+            for x, y, w in chunk:
+                for z in (x, y):
+                    if z not in nodes:
+                        nodes[z] = slow.insert_vertex(z)
+                slow.insert_edge(nodes[x], nodes[y], w)
+        print(f"{'insert_edge per edge':>24}: {time.perf_counter() - start:.2f} s")
+        start = time.perf_counter()
+        fast = Graph.from_edges((edge for chunk in read_edge_chunks(big, label=int) for edge in chunk))
+        print(f"{'Graph.from_edges':>24}: {time.perf_counter() - start:.2f} s")
+        start = time.perf_counter()
+        csr = load_edge_list(big, label=int)
+        print(f"{'load_edge_list':>24}: {time.perf_counter() - start:.2f} s")
+        snapshot = os.path.join(folder, "big.csrg")
+        start = time.perf_counter()
+        save_snapshot(csr, snapshot)
+        print(f"{'save_snapshot':>24}: {time.perf_counter() - start:.2f} s, {os.path.getsize(snapshot)} bytes")
+        start = time.perf_counter()
+        mapped = load_snapshot(snapshot, labels=False)
+        print(f"{'load_snapshot':>24}: {(time.perf_counter() - start) * 1000:.2f} ms")
+        assert list(mapped.csr_arrays()[1]) == list(csr.csr_arrays()[1])
+        mapped.close()
@@ -0,0 +1,174 @@
+class LinkCutTree:
+    """
+    Forest of rooted trees supporting link, cut and path maximum queries in O(log n) amortized time.
+
+    Each tree is split into preferred paths, each stored as a splay tree keyed by depth. Nodes are
+    integer ids and all fields live in parallel lists; every operation is iterative, so deep
+    trees do not hit the recursion limit.
+    """
+
+    def __init__(self):
+        self._left = []
+        self._right = []
+        self._parent = []  # splay parent, or path-parent pointer when x is the root of its splay tree
+        self._flip = []  # pending reversal of the splay subtree
+        self._value = []
+        self._best = []  # node of largest value in the splay subtree
+
+    def __len__(self):
+        return len(self._value)
+
+    def add_node(self, value=float("-inf")):
+        """Add a single node tree with the given value and return its id"""
+        self._left.append(-1)
+        self._right.append(-1)
+        self._parent.append(-1)
+        self._flip.append(False)
+        self._value.append(value)
+        self._best.append(len(self._best))
+        return len(self._value) - 1
+
+    def value(self, x):
+        """Return the value of node x"""
+        return self._value[x]
+
+    def set_value(self, x, value):
+        """Change the value of node x, which must be a single node tree (no link)"""
+        self._value[x] = value
+        self._best[x] = x
+
+    def _is_root(self, x):
+        """Return True if x is the root of its splay tree"""
+        p = self._parent[x]
+        return p < 0 or (self._left[p] != x and self._right[p] != x)
+
+    def _push(self, x):
+        """Apply the pending reversal of x to its children"""
+        if self._flip[x]:
+            left, right = self._left[x], self._right[x]
+            self._left[x], self._right[x] = right, left
+            if left >= 0:
+                self._flip[left] = not self._flip[left]
+            if right >= 0:
+                self._flip[right] = not self._flip[right]
+            self._flip[x] = False
+
+    def _update(self, x):
+        """Recompute the best node of the splay subtree of x from its children"""
+        best = x
+        for c in (self._left[x], self._right[x]):
+            if c >= 0 and self._value[self._best[c]] > self._value[best]:
+                best = self._best[c]
+        self._best[x] = best
+
+    def _rotate(self, x):
+        """Rotate x above its splay parent"""
+        left, right, parent = self._left, self._right, self._parent
+        p = parent[x]
+        g = parent[p]
+        if not self._is_root(p):
+            if left[g] == p:
+                left[g] = x
+            else:
+                right[g] = x
+        parent[x] = g
+        if left[p] == x:
+            left[p] = right[x]
+            if right[x] >= 0:
+                parent[right[x]] = p
+            right[x] = p
+        else:
+            right[p] = left[x]
+            if left[x] >= 0:
+                parent[left[x]] = p
+            left[x] = p
+        parent[p] = x
+        self._update(p)
+        self._update(x)
+
+    def _splay(self, x):
+        """Move x to the root of its splay tree"""
+        path = [x]  # push pending reversals from the splay root down to x first
+        y = x
+        while not self._is_root(y):
+            y = self._parent[y]
+            path.append(y)
+        for y in reversed(path):
+            self._push(y)
+
+        while not self._is_root(x):
+            p = self._parent[x]
+            if not self._is_root(p):
+                g = self._parent[p]
+                if (self._left[g] == p) == (self._left[p] == x):
+                    self._rotate(p)  # zig-zig
+                else:
+                    self._rotate(x)  # zig-zag
+            self._rotate(x)
+
+    def _access(self, x):
+        """Make the path from the root of the tree to x preferred, with x at the root of its splay tree"""
+        last = -1
+        y = x
+        while y >= 0:
+            self._splay(y)
+            self._right[y] = last
+            self._update(y)
+            last = y
+            y = self._parent[y]
+        self._splay(x)
+
+    def make_root(self, x):
+        """Make x the root of its tree"""
+        self._access(x)
+        self._flip[x] = not self._flip[x]
+
+    def find_root(self, x):
+        """Return the root of the tree containing x"""
+        self._access(x)
+        self._push(x)
+        while self._left[x] >= 0:
+            x = self._left[x]
+            self._push(x)
+        self._splay(x)
+        return x
+
+    def connected(self, x, y):
+        """Return True if x and y are in the same tree"""
+        return x == y or self.find_root(x) == self.find_root(y)
+
+    def link(self, x, y):
+        """Add an edge between x and y, which must be in different trees"""
+        self.make_root(x)
+        self._parent[x] = y
+
+    def cut(self, x, y):
+        """Remove the edge between adjacent nodes x and y"""
+        self.make_root(x)
+        self._access(y)
+        self._push(y)
+        if self._left[y] == x:
+            self._push(x)
+        if self._left[y] != x or self._right[x] >= 0 or self._left[x] >= 0:
+            raise ValueError("nodes are not adjacent")
+        self._left[y] = -1
+        self._parent[x] = -1
+        self._update(y)
+
+    def path_max(self, x, y):
+        """Return the node of largest value on the path between x and y, which must be connected"""
+        self.make_root(x)
+        self._access(y)
+        return self._best[y]
+
+
+if __name__ == "__main__":
+    lct = LinkCutTree()
+    nodes = [lct.add_node(w) for w in (0, 5, 3, 8, 1)]
+    lct.link(nodes[0], nodes[1])
+    lct.link(nodes[1], nodes[2])
+    lct.link(nodes[2], nodes[3])
+    print(lct.connected(nodes[0], nodes[3]), lct.connected(nodes[0], nodes[4]))  # True False
+    print(lct.value(lct.path_max(nodes[0], nodes[2])))  # 5
+    lct.cut(nodes[1], nodes[2])
+    print(lct.connected(nodes[0], nodes[3]))  # False
@@ -0,0 +1,385 @@
+import time
+from array import array
+
+from base import Graph, Vertex
+
+
+class FlowNetwork:
+    """
+    Residual network of a graph whose edge elements are capacities, stored in flat arrays.
+
+    Every edge (u, v) of capacity c becomes an arc u -> v of residual capacity c and a paired arc
+    v -> u of residual capacity 0 (c for an undirected edge). The arcs leaving vertex i are
+    arcs offsets[i]..offsets[i + 1] - 1, arc a goes to head[a], has residual capacity residual[a]
+    and its paired arc is pair[a]. Vertices are numbered 0..n-1 internally; the methods take and
+    return the vertices of the original graph.
+    """
+
+    def __init__(self, g: Graph):
+        """Build the residual network of g (Graph or CSRGraph) with no flow"""
+        self._vertices = list(g.vertices())
+        self._index = {v: i for i, v in enumerate(self._vertices)}
+        self._edges = list(g.edges())
+        n, m = len(self._vertices), len(self._edges)
+        directed = self._directed = g.is_directed()
+
+        ends = []
+        offsets = array("q", bytes(8 * (n + 1)))
+        for e in self._edges:
+            u, v = e.endpoints()
+            i, j = self._index[u], self._index[v]
+            ends.append((i, j))
+            offsets[i + 1] += 1
+            offsets[j + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+
+        head = array("q", bytes(16 * m))
+        pair = array("q", bytes(16 * m))
+        residual = [0] * (2 * m)
+        arc = array("q", bytes(8 * m))  # arc of each edge
+        free = offsets[:n]
+        for k, (i, j) in enumerate(ends):
+            c = self._edges[k].element()
+            a = free[i]
+            free[i] += 1
+            b = free[j]
+            free[j] += 1
+            head[a], head[b] = j, i
+            residual[a], residual[b] = c, (0 if directed else c)
+            pair[a], pair[b] = b, a
+            arc[k] = a
+        self._offsets, self._head, self._pair, self._arc = offsets, head, pair, arc
+        self._capacity = residual  # capacity of each arc
+        self._residual = residual[:]
+        self._edge_index = None
+        self._value = 0
+        self._source = None
+
+    def reset(self):
+        """Remove all flow"""
+        self._residual = self._capacity[:]
+        self._value = 0
+        self._source = None
+
+    def value(self):
+        """Return the value of the last maximum flow computed"""
+        return self._value
+
+    def flow(self, e):
+        """Return the flow on edge e of the original graph (negative if it goes from e's destination to its origin)"""
+        if self._edge_index is None:
+            self._edge_index = {x: k for k, x in enumerate(self._edges)}
+        a = self._arc[self._edge_index[e]]
+        return self._capacity[a] - self._residual[a]
+
+    def _reachable(self, s):
+        """Return a bytearray marking the vertices reachable from vertex id s in the residual network"""
+        offsets, head, residual = self._offsets, self._head, self._residual
+        seen = bytearray(len(self._vertices))
+        seen[s] = 1
+        queue = [s]
+        for u in queue:
+            for a in range(offsets[u], offsets[u + 1]):
+                v = head[a]
+                if residual[a] > 0 and not seen[v]:
+                    seen[v] = 1
+                    queue.append(v)
+        return seen
+
+    def _levels(self, s, t):
+        """BFS levels from s in the residual network, -1 for unreached vertices; stops after the level of t"""
+        offsets, head, residual = self._offsets, self._head, self._residual
+        level = [-1] * len(self._vertices)
+        level[s] = 0
+        queue = [s]
+        for u in queue:
+            if u == t:
+                break
+            next_level = level[u] + 1
+            for a in range(offsets[u], offsets[u + 1]):
+                v = head[a]
+                if residual[a] > 0 and level[v] < 0:
+                    level[v] = next_level
+                    queue.append(v)
+        return level
+
+    def dinic(self, s: Vertex, t: Vertex):
+        """
+        Compute a maximum flow from s to t with Dinic's algorithm, in O(n^2 m) time.
+
+        Each phase computes BFS levels from s in the residual network and saturates a blocking flow
+        of the level graph with an iterative DFS that keeps a current arc per vertex, so every arc is
+        skipped at most once per phase. Starts from the current flow.
+        :return: the value of the maximum flow
+        """
+        s, t = self._index[s], self._index[t]
+        if s == t:
+            raise ValueError("source and sink must be different")
+        offsets, head, pair, residual = self._offsets, self._head, self._pair, self._residual
+        total = 0
+        while True:
+            level = self._levels(s, t)
+            if level[t] < 0:
+                break
+            current = list(offsets)  # current arc of each vertex
+            path = []  # arcs from s to u
+            u = s
+            while True:
+                if u == t:  # augment along path and retreat to the tail of its first saturated arc
+                    f = min(residual[a] for a in path)
+                    for a in path:
+                        residual[a] -= f
+                        residual[pair[a]] += f
+                    total += f
+                    k = next(k for k, a in enumerate(path) if residual[a] == 0)
+                    u = head[pair[path[k]]]
+                    del path[k:]
+                    continue
+                end = offsets[u + 1]
+                a = current[u]
+                while a < end and (residual[a] == 0 or level[head[a]] != level[u] + 1):
+                    a += 1
+                current[u] = a
+                if a < end:  # advance
+                    path.append(a)
+                    u = head[a]
+                elif u == s:
+                    break  # blocking flow found
+                else:  # dead end: remove u from the level graph and retreat
+                    level[u] = -1
+                    a = path.pop()
+                    u = head[pair[a]]
+                    current[u] += 1
+        self._value += total
+        self._source = s
+        return self._value
+
+    def push_relabel(self, s: Vertex, t: Vertex):
+        """
+        Compute a maximum flow from s to t with the highest-label push-relabel algorithm, in O(n^2 sqrt(m)) time.
+
+        Active vertices (with excess flow) are discharged highest label first. Labels are exact BFS
+        distances to t after a global relabeling, done at the start and after every n relabels, and
+        the gap heuristic lifts every vertex above an empty label at once: they can not reach t anymore.
+        Once no active vertex can reach t, the excess left is returned to s the same way, with labels
+        measuring the distance to s. Starts from a zero flow.
+        :return: the value of the maximum flow
+        """
+        s, t = self._index[s], self._index[t]
+        if s == t:
+            raise ValueError("source and sink must be different")
+        self.reset()
+        n = len(self._vertices)
+        offsets, head, pair, residual = self._offsets, self._head, self._pair, self._residual
+        height = [0] * n
+        excess = [0] * n
+        current = list(offsets)
+
+        def global_relabel(target, base):
+            """Set the label of every vertex to base + its distance to target, 2n if it can not reach it"""
+            for v in range(n):
+                height[v] = 2 * n
+            height[target] = base
+            queue = [target]
+            for v in queue:
+                for b in range(offsets[v], offsets[v + 1]):
+                    u = head[b]
+                    if residual[pair[b]] > 0 and height[u] == 2 * n:
+                        height[u] = height[v] + 1
+                        queue.append(u)
+
+        def discharge(u, limit, count):
+            """Push the excess of u along admissible arcs and relabel it; return the number of relabels"""
+            relabels = 0
+            while excess[u] > 0:
+                a = current[u]
+                if a == offsets[u + 1]:
+                    old = height[u]
+                    new = 2 * n
+                    for b in range(offsets[u], offsets[u + 1]):
+                        if residual[b] > 0 and height[head[b]] + 1 < new:
+                            new = height[head[b]] + 1
+                    relabels += 1
+                    current[u] = offsets[u]
+                    if count is not None and old < limit:
+                        count[old] -= 1
+                        if count[old] == 0:  # gap: the vertices above old can not reach t anymore
+                            for v in range(n):
+                                if old < height[v] < limit:
+                                    count[height[v]] -= 1
+                                    height[v] = limit
+                            new = limit
+                        elif new < limit:
+                            count[new] += 1
+                    height[u] = new
+                    if height[u] >= limit:
+                        break
+                    continue
+                v = head[a]
+                if residual[a] > 0 and height[u] == height[v] + 1:
+                    d = min(excess[u], residual[a])
+                    residual[a] -= d
+                    residual[pair[a]] += d
+                    excess[u] -= d
+                    if excess[v] == 0 and v != s and v != t:
+                        buckets[height[v]].append(v)
+                    excess[v] += d
+                else:
+                    current[u] = a + 1
+            return relabels
+
+        # phase 1: maximum preflow, only vertices that can reach t are discharged
+        global_relabel(t, 0)
+        height[s] = n
+        buckets = [[] for _ in range(2 * n + 1)]
+        for a in range(offsets[s], offsets[s + 1]):
+            d = residual[a]
+            if d > 0:
+                v = head[a]
+                residual[a] = 0
+                residual[pair[a]] += d
+                if excess[v] == 0 and v != s and v != t:
+                    buckets[height[v]].append(v)
+                excess[v] += d
+                excess[s] -= d
+
+        count = [0] * (n + 1)
+        for v in range(n):
+            if height[v] < n:
+                count[height[v]] += 1
+        top = n - 1
+        work = 0
+        while top >= 0:
+            if not buckets[top]:
+                top -= 1
+                continue
+            u = buckets[top].pop()
+            if height[u] != top or excess[u] == 0:
+                continue  # outdated entry
+            work += discharge(u, n, count)
+            top = min(height[u], n - 1)  # pushes went to vertices below u
+            if work > n:  # global relabeling
+                work = 0
+                global_relabel(t, 0)
+                height[s] = n
+                current[:] = offsets
+                count = [0] * (n + 1)
+                buckets = [[] for _ in range(2 * n + 1)]
+                for v in range(n):
+                    if height[v] < n:
+                        count[height[v]] += 1
+                    if excess[v] > 0 and v != s and v != t and height[v] < n:
+                        buckets[height[v]].append(v)
+                top = n - 1
+        self._value = excess[t]
+
+        # phase 2: return the excess of the vertices cut from t to s, turning the preflow into a flow
+        global_relabel(s, n)
+        height[t] = 2 * n
+        current[:] = offsets
+        buckets = [[] for _ in range(2 * n + 1)]
+        for v in range(n):
+            if excess[v] > 0 and v != s and v != t:
+                buckets[height[v]].append(v)
+        top = 2 * n
+        while top >= 0:
+            if not buckets[top]:
+                top -= 1
+                continue
+            u = buckets[top].pop()
+            if height[u] != top or excess[u] == 0:
+                continue
+            discharge(u, 2 * n + 1, None)
+            top = height[u]
+        self._source = s
+        return self._value
+
+    def min_cut(self):
+        """
+        Return a minimum cut separating the source and the sink of the last maximum flow computed.
+
+        The source side is the set of vertices still reachable from the source in the residual network;
+        every edge leaving it is saturated and every edge entering it is empty, so the capacity of the
+        edges leaving it equals the value of the flow.
+        :return: a pair (source_side, cut_edges) of the set of vertices on the source side and the list of
+                 edges of the original graph leaving the source side (crossing the cut if g is undirected)
+        """
+        if self._source is None:
+            raise ValueError("compute a maximum flow first")
+        seen = self._reachable(self._source)
+        source_side = {self._vertices[i] for i in range(len(seen)) if seen[i]}
+        cut = []
+        for k, e in enumerate(self._edges):
+            a = self._arc[k]
+            i, j = self._head[self._pair[a]], self._head[a]
+            if seen[i] != seen[j] and (seen[i] or not self._directed):
+                cut.append(e)
+        return source_side, cut
+
+
+def max_flow(g: Graph, s: Vertex, t: Vertex, algorithm="dinic"):
+    """
+    Compute a maximum flow from s to t in graph g whose edge elements are the capacities.
+    :param algorithm: "dinic" or "push_relabel"
+    :return: a pair (value, network), network being the FlowNetwork holding the flow of each edge
+    """
+    network = FlowNetwork(g)
+    if algorithm == "dinic":
+        value = network.dinic(s, t)
+    elif algorithm == "push_relabel":
+        value = network.push_relabel(s, t)
+    else:
+        raise ValueError(f"unknown algorithm {algorithm}")
+    return value, network
+
+
+def min_cut(g: Graph, s: Vertex, t: Vertex):
+    """
+    Compute a minimum s-t cut of graph g whose edge elements are the capacities.
+    :return: a triple (capacity, source_side, cut_edges)
+    """
+    value, network = max_flow(g, s, t)
+    source_side, cut = network.min_cut()
+    return value, source_side, cut
+
+
+if __name__ == "__main__":
+    g = Graph(directed=True)
+    s = g.insert_vertex("s")
+    a = g.insert_vertex("a")
+    b = g.insert_vertex("b")
+    c = g.insert_vertex("c")
+    d = g.insert_vertex("d")
+    t = g.insert_vertex("t")
+
+    g.insert_edge(s, a, 16)
+    g.insert_edge(s, c, 13)
+    g.insert_edge(a, b, 12)
+    g.insert_edge(c, a, 4)
+    g.insert_edge(b, c, 9)
+    g.insert_edge(c, d, 14)
+    g.insert_edge(d, b, 7)
+    g.insert_edge(b, t, 20)
+    g.insert_edge(d, t, 4)
+
+    value, network = max_flow(g, s, t)
+    print(value, {str(e): network.flow(e) for e in g.edges()})  # 23 ...
+    print(max_flow(g, s, t, "push_relabel")[0])  # 23
+    capacity, side, cut = min_cut(g, s, t)
+    print(capacity, sorted(map(str, side)), cut)  # 23 ['a', 'c', 'd', 's'] [a -> b, d -> b, d -> t]
+
+    # benchmark on generated layered and grid networks
+    from generators import layered_network, grid_network
+
+    for name, (net, source, sink) in (("layered 40 x 250", layered_network(40, 250, seed=20)),
+                                      ("grid 80 x 80", grid_network(80, 80, seed=20))):
+        print(f"{name}: {net.vertex_count()} vertices, {net.edge_count()} edges")
+        values = []
+        for algorithm in ("dinic", "push_relabel"):
+            start = time.perf_counter()
+            value, network = max_flow(net, source, sink, algorithm)
+            print(f"{algorithm:>24}: {time.perf_counter() - start:.2f} s, flow {value}")
+            values.append(value)
+            assert sum(e.element() for e in network.min_cut()[1]) == value
+        assert values[0] == values[1]
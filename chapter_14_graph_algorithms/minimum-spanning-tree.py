@@ -1,5 +1,21 @@
-from base import Graph, Vertex, Edge, Partition
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+
+from base import Graph, Vertex, Edge, ArrayPartition
+from csr_graph import CSRGraph
 from chapter_9_priority_queues import AdaptableHeapPriorityQueue
+from link_cut_tree import LinkCutTree
+
+INF = float("inf")
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, it speeds up mst_kruskal and the rounds of mst_boruvka
+    np = None
 
 
 def mst_prim_jarnik(g: Graph):
@@ -9,6 +25,8 @@ def mst_prim_jarnik(g: Graph):
     :param g: Graph
     :return: mst of graph g
     """
+    if g.is_indexed():
+        return _indexed_prim_jarnik(g)
 
     d = {}  # is bound on distance to tree
     tree = []  # list of edges in spanning tree
@@ -40,38 +58,431 @@ def mst_prim_jarnik(g: Graph):
     return tree
 
 
+def _indexed_prim_jarnik(g: Graph):
+    """mst_prim_jarnik for an indexed graph: bounds and locators in lists, weights from g.weights()"""
+    weights = g.weights()
+    n = g.vertex_count()
+    d = [float("inf")] * n
+    tree = []
+    pq = AdaptableHeapPriorityQueue()
+    pq_locator = [None] * n  # None once the vertex is in the tree
+    for v in g.vertices():
+        if pq.is_empty():
+            d[v._index] = 0
+        pq_locator[v._index] = pq.add(d[v._index], (v, None))
+
+    while not pq.is_empty():
+        k, (u, edge) = pq.remove_min()
+        pq_locator[u._index] = None
+        if edge is not None:
+            tree.append(edge)
+        for link in g.incident_edges(u):
+            v = link.opposite(u)
+            i = v._index
+            if pq_locator[i] is not None:
+                w = weights[link._index]
+                if w < d[i]:
+                    d[i] = w
+                    pq.update(pq_locator[i], w, (v, link))
+    return tree
+
+
 def mst_kruskal(g: Graph):
     """
     Compute a MST of a graph g using Kruskal'a algorithm
-    :param g:
-    :return:
+
+    The edges are sorted by weight once (with NumPy's argsort when available) instead of going through
+    a priority queue, the clusters are kept in an ArrayPartition over vertex indices, and the scan stops
+    as soon as the tree has n - 1 edges.
+    :param g: an undirected weighted graph
+    :return: list of the edges of a minimum spanning tree (forest if g is not connected)
     """
+    index = {v: i for i, v in enumerate(g.vertices())}
+    size = len(index)
+    edges = list(g.edges())
+    if np is not None:
+        weights = np.fromiter((e.element() for e in edges), dtype=float, count=len(edges))
+        order = np.argsort(weights, kind="stable").tolist()
+    else:
+        order = sorted(range(len(edges)), key=lambda i: edges[i].element())
+
     tree = []
-    pq = AdaptableHeapPriorityQueue()
-    forest = Partition()
-    position = {}
+    forest = ArrayPartition(size)
+    for i in order:
+        if len(tree) == size - 1:
+            break
+        e = edges[i]
+        u, v = e.endpoints()
+        if forest.union(index[u], index[v]):
+            tree.append(e)
+    return tree
 
-    for v in g.vertices():
-        position[v] = forest.make_group(v)
 
-    for e in g.edges():
-        pq.add(e.element(), e)
+def _cheapest(sources, targets, weights, live, comp, k, lo, hi):
+    """
+    Scan the edge ids live[lo:hi] and return (kept, best), best[c] being the id of the cheapest edge
+    leaving component c (the first one in case of ties, -1 if none) for the k components. The kept
+    edges, joining two components, are moved to the front of the range, edges inside a component are dropped.
+    """
+    best = array("q", [-1]) * k
+    best_weight = [INF] * k
+    kept = lo
+    for j in range(lo, hi):
+        i = live[j]
+        cu = comp[sources[i]]
+        cv = comp[targets[i]]
+        if cu == cv:
+            continue
+        live[kept] = i
+        kept += 1
+        w = weights[i]
+        if w < best_weight[cu]:
+            best_weight[cu] = w
+            best[cu] = i
+        if w < best_weight[cv]:
+            best_weight[cv] = w
+            best[cv] = i
+    return kept - lo, best
 
-    size = g.vertex_count()
 
-    while len(tree) != size - 1 and not pq.is_empty():
-        w, e = pq.remove_min()
-        u, v = e.endpoints()
+def _cheapest_numpy(sources, targets, live, comp, rank, k, lo, hi):
+    """
+    NumPy version of _cheapest on NumPy views of the edge arrays: return (kept, best), best[c] being the
+    smallest rank of an edge leaving component c (len(rank) if none), and compact the kept edges the same way.
+    """
+    ids = live[lo:hi]
+    cu = comp[sources[ids]]
+    cv = comp[targets[ids]]
+    crossing = cu != cv
+    ids = ids[crossing]
+    live[lo:lo + len(ids)] = ids
+    ranks = rank[ids]
+    best = np.full(k, len(rank), dtype=np.int64)
+    np.minimum.at(best, cu[crossing], ranks)
+    np.minimum.at(best, cv[crossing], ranks)
+    return len(ids), best
 
-        a = forest.find(position[u])
-        b = forest.find(position[v])
 
-        if a != b:
-            tree.append(e)
-            forest.union(a, b)
+def _numpy_views(arrays):
+    """Return NumPy arrays sharing the buffers of a list of array.array or memoryview arrays"""
+    dtypes = {"q": np.int64, "d": np.float64}  # not "q" itself: ufunc.at has no fast loop for long long
+    return [np.frombuffer(a, dtype=dtypes[getattr(a, "typecode", None) or a.format]) for a in arrays]
+
+
+def _cheapest_step(arrays, k, lo, hi):
+    """Scan one chunk of the live edges of a round, with NumPy when it is installed"""
+    if np is not None:
+        return _cheapest_numpy(*_numpy_views(arrays[:2] + arrays[3:]), k, lo, hi)
+    return _cheapest(*arrays[:5], k, lo, hi)
+
+
+_edges = None  # (sources, targets, weights, live, comp, rank) views attached by each worker process
+
+
+def _map_edges(block, n, m):
+    """Return the sources, targets, weights, live, comp and rank views of a shared edge array block"""
+    base = block.buf
+    views = [base[:8 * m], base[8 * m:16 * m], base[16 * m:24 * m], base[24 * m:32 * m],
+             base[32 * m:32 * m + 8 * n], base[32 * m + 8 * n:40 * m + 8 * n]]
+    return [view.cast(code) for view, code in zip(views, "qqdqqq")], views
+
+
+def _attach(name, n, m):
+    """Worker initializer: map the shared edge array once per process"""
+    global _edges
+    block = shared_memory.SharedMemory(name=name)
+    _edges, views = _map_edges(block, n, m)
+
+    def close():
+        for view in _edges + views:
+            view.release()
+        block.close()
+
+    util.Finalize(None, close, exitpriority=10)
+
+
+def _worker_cheapest(k, lo, hi):
+    """Worker task: scan one chunk of the shared edge array"""
+    return _cheapest_step(_edges, k, lo, hi)
+
+
+def _csr_edges(g: CSRGraph):
+    """Return the (sources, targets, weights) arrays of the edges of a CSRGraph, each undirected edge once"""
+    offsets, heads, costs = g.csr_arrays()
+    n = g.vertex_count()
+    if np is not None:
+        origin = np.repeat(np.arange(n, dtype=np.int64), np.diff(np.frombuffer(offsets, dtype=np.int64)))
+        target = np.frombuffer(heads, dtype=np.int64)
+        weight = np.ones(len(target)) if costs is None else np.frombuffer(costs, dtype=np.float64)
+        keep = slice(None) if g.is_directed() else origin <= target
+        return (array("q", origin[keep].tobytes()), array("q", target[keep].tobytes()),
+                array("d", weight[keep].tobytes()))
+    sources, targets, weights = array("q"), array("q"), array("d")
+    for u in range(n):
+        for a in range(offsets[u], offsets[u + 1]):
+            v = heads[a]
+            if g.is_directed() or u <= v:
+                sources.append(u)
+                targets.append(v)
+                weights.append(1.0 if costs is None else costs[a])
+    return sources, targets, weights
+
+
+def _merge_cheapest(results, weights):
+    """Return the cheapest edge of every component among the per-worker best arrays, the first one on ties"""
+    best = results[0]
+    for found in results[1:]:
+        for c, i in enumerate(found):
+            j = best[c]
+            if i >= 0 and (j < 0 or weights[i] < weights[j]):
+                best[c] = i
+    return best
+
+
+def _compact(live, ranges, results):
+    """Move the edges kept by each chunk to the front of live and return their number"""
+    size = 0
+    for (lo, _), (kept, _) in zip(ranges, results):
+        live[size:size + kept] = live[lo:lo + kept]
+        size += kept
+    return size
+
+
+def _boruvka_rounds(arrays, n, m, scan):
+    """
+    Run the Boruvka rounds in pure Python on the edge arrays, scan(k, size) returning the chunk ranges
+    and the (kept, best) results of a round. Return the ids of the tree edges.
+    """
+    sources, targets, weights, live, comp = arrays[:5]
+    tree = []
+    forest = ArrayPartition(n)
+    k = n  # number of components
+    size = m  # live[:size] are the ids, in increasing order, of the edges that may still join two components
+    while size > 0 and k > 1:
+        ranges, results = scan(k, size)
+        size = _compact(live, ranges, results)
+        best = _merge_cheapest([found for _, found in results], weights)
+        tree.extend(i for i in sorted(set(best)) if i >= 0 and forest.union(sources[i], targets[i]))
+        labels = {}
+        for v in range(n):
+            comp[v] = labels.setdefault(forest.find(v), len(labels))
+        k = len(labels)
+    return tree
+
+
+def _boruvka_rounds_numpy(arrays, n, m, scan):
+    """
+    _boruvka_rounds with NumPy. Edges are ranked once by (weight, id), so every component has a single
+    cheapest edge. Each component then points to the other end of its cheapest edge: the only cycles are
+    the pairs of components that chose the same edge, broken at the smaller one, and pointer jumping
+    gives the new component of every old one.
+    """
+    sources, targets, weights, live, comp, rank = _numpy_views(arrays)
+    order = np.argsort(weights, kind="stable")
+    rank[order] = np.arange(m)
+    tree = []
+    k, size = n, m
+    while size > 0 and k > 1:
+        ranges, results = scan(k, size)
+        size = _compact(live, ranges, results)
+        best = np.minimum.reduce([found for _, found in results])
+        found = np.flatnonzero(best < m)
+        chosen = order[best[found]]
+        tree.extend(np.unique(chosen).tolist())
+
+        parent = np.arange(k)
+        cu = comp[sources[chosen]]
+        parent[found] = np.where(cu == found, comp[targets[chosen]], cu)
+        c = np.arange(k)
+        pair = (parent[parent] == c) & (c < parent)
+        parent[pair] = c[pair]
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+        roots, label = np.unique(parent, return_inverse=True)
+        comp[:] = label[comp]
+        k = len(roots)
     return tree
 
 
+def mst_boruvka(g: Graph, workers=None):
+    """
+    Compute a MST of a graph g using Boruvka's algorithm.
+
+    Each round finds the cheapest edge leaving every component and adds all of them at once, so there
+    are at most log n rounds. The edge endpoints and weights are copied once into a shared memory block,
+    straight from the CSR arrays if g is a CSRGraph, with the component of every vertex and the ids of
+    the edges still joining two components. Each round gives every worker process one slice of these
+    edges; a worker drops the edges that became internal to a component and returns the cheapest edge
+    of every component within its slice. The main process merges these per-worker arrays and renumbers
+    the components 0, 1, ..., k-1.
+
+    With NumPy, the scans, merges and renumbering of a round are array operations, and one process
+    already beats mst_kruskal on large sparse graphs. Workers only help on a machine with free cores,
+    since every round still ends with O(n) work in the main process. Without NumPy, the rounds run in
+    pure Python and mst_boruvka is slower than mst_kruskal, even with several workers.
+
+    :param g: an undirected weighted graph (Graph or CSRGraph)
+    :param workers: number of worker processes, os.cpu_count() by default, 1 to stay in process
+    :return: list of the edges of a minimum spanning tree (forest if g is not connected)
+    """
+    if isinstance(g, CSRGraph):
+        n = g.vertex_count()
+        edges = None  # tree edges are built from the arrays, like CSRGraph.edges() does
+        edge_arrays = _csr_edges(g)
+        weighted = g.csr_arrays()[2] is not None
+        m = len(edge_arrays[0])
+    else:
+        index = {v: i for i, v in enumerate(g.vertices())}
+        edges = list(g.edges())
+        n, m = len(index), len(edges)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    block = pool = None
+    arrays, views = [], []
+    try:
+        if workers > 1 and m > 0:
+            block = shared_memory.SharedMemory(create=True, size=40 * m + 8 * n)
+            arrays, views = _map_edges(block, n, m)
+            pool = ProcessPoolExecutor(workers, initializer=_attach, initargs=(block.name, n, m))
+        else:
+            arrays = [array("q", [0]) * m, array("q", [0]) * m, array("d", [0.0]) * m, array("q", [0]) * m,
+                      array("q", [0]) * n, array("q", [0]) * m]
+        sources, targets, weights, live, comp, _ = arrays
+
+        if edges is None:
+            sources[:], targets[:], weights[:] = edge_arrays
+        else:
+            for i, e in enumerate(edges):
+                u, v = e.endpoints()
+                sources[i] = index[u]
+                targets[i] = index[v]
+                weights[i] = e.element()
+        live[:] = array("q", range(m))
+        comp[:] = array("q", range(n))
+
+        def scan(k, size):
+            chunk = (size + workers - 1) // workers
+            ranges = [(lo, min(lo + chunk, size)) for lo in range(0, size, chunk)]
+            if pool is not None:
+                tasks = [pool.submit(_worker_cheapest, k, lo, hi) for lo, hi in ranges]
+                return ranges, [task.result() for task in tasks]
+            return ranges, [_cheapest_step(arrays, k, lo, hi) for lo, hi in ranges]
+
+        rounds = _boruvka_rounds if np is None else _boruvka_rounds_numpy
+        tree = rounds(arrays, n, m, scan)
+        if edges is not None:
+            return [edges[i] for i in tree]
+        return [Edge(sources[i], targets[i], weights[i] if weighted else None) for i in tree]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if block is not None:
+            for view in arrays + views:
+                view.release()
+            block.close()
+            block.unlink()
+
+
+class DynamicMST:
+    """
+    Minimum spanning forest of a graph that only receives new edges.
+
+    The forest is stored in a link-cut tree where each forest edge is a node of its own, valued by
+    the edge weight, between the nodes of its two endpoints. By the cycle property, a new edge (u, v)
+    joins the forest if u and v are in different trees, or if it is lighter than the heaviest edge
+    on the forest path from u to v, which it replaces. Each insertion takes O(log n) amortized time.
+
+    Graph.insert_edge replaces an existing edge between the same two vertices. If that edge is in the
+    forest, the new edge takes its place when it is not heavier. A heavier one raises ValueError, since
+    the edges that left the forest are not kept and a weight increase could need one of them back.
+    """
+
+    def __init__(self, g: Graph = None):
+        self._lct = LinkCutTree()
+        self._node = {}  # vertex -> node id
+        self._edge = {}  # node id -> forest edge
+        self._between = {}  # (node id, node id) of the endpoints, smaller first -> node id of their forest edge
+        self._free = []  # node ids of edges that left the forest, reused for new edges
+        self._weight = 0
+        if g is not None:
+            for v in g.vertices():
+                self.add_vertex(v)
+            for e in g.edges():
+                self.insert_edge(e)
+
+    def __len__(self):
+        """Return the number of edges in the forest"""
+        return len(self._edge)
+
+    def add_vertex(self, v: Vertex):
+        """Add an isolated vertex to the forest (insert_edge adds unknown endpoints itself)"""
+        if v not in self._node:
+            self._node[v] = self._lct.add_node()
+
+    def insert_edge(self, e: Edge):
+        """
+        Update the forest after edge e was inserted into the graph.
+
+        :param e: the new edge, its element is the weight
+        :return: the edge that is not part of the forest anymore: None if e connected two trees,
+                 the replaced edge if e is lighter than the heaviest edge of the cycle it closes or
+                 replaces a forest edge between the same vertices, e otherwise
+        """
+        u, v = e.endpoints()
+        self.add_vertex(u)
+        self.add_vertex(v)
+        a, b = self._node[u], self._node[v]
+        if a == b:
+            return e  # a self loop never belongs to a spanning forest
+        removed = None
+        same = self._between.get((min(a, b), max(a, b)))
+        if same is not None:  # e replaces the forest edge between u and v in the graph
+            if self._edge[same].element() < e.element():
+                raise ValueError("the new edge is heavier than the forest edge it replaces")
+            removed = self._cut(same)
+        elif self._lct.connected(a, b):
+            heaviest = self._lct.path_max(a, b)
+            if self._lct.value(heaviest) <= e.element():
+                return e
+            removed = self._cut(heaviest)
+
+        if self._free:
+            node = self._free.pop()
+            self._lct.set_value(node, e.element())
+        else:
+            node = self._lct.add_node(e.element())
+        self._edge[node] = e
+        self._between[min(a, b), max(a, b)] = node
+        self._lct.link(a, node)
+        self._lct.link(node, b)
+        self._weight += e.element()
+        return removed
+
+    def _cut(self, node):
+        """Remove the forest edge of node from the link-cut tree and return it"""
+        removed = self._edge.pop(node)
+        x, y = removed.endpoints()
+        a, b = self._node[x], self._node[y]
+        del self._between[min(a, b), max(a, b)]
+        self._lct.cut(a, node)
+        self._lct.cut(node, b)
+        self._weight -= removed.element()
+        self._free.append(node)
+        return removed
+
+    def edges(self):
+        """Return a list of the edges of the forest"""
+        return list(self._edge.values())
+
+    def weight(self):
+        """Return the total weight of the forest"""
+        return self._weight
+
+
 if __name__ == "__main__":
     g = Graph()
     v0 = g.insert_vertex(0)
@@ -101,6 +512,59 @@ if __name__ == "__main__":
 
     tree = mst_prim_jarnik(g)
     tree_k = mst_kruskal(g)
+    tree_b = mst_boruvka(g, workers=2)
 
     print(tree)
     print(tree_k)
+    print(tree_b)
+
+    dynamic = DynamicMST(g)
+    print(dynamic.weight(), sum(e.element() for e in tree))  # 37 37
+    print(dynamic.insert_edge(g.insert_edge(v3, v8, 1)))  # 2 -> 3, heaviest edge of the cycle 3, 2, 8
+    print(dynamic.insert_edge(g.insert_edge(v3, v8, 0)), dynamic.weight())  # 3 -> 8 30, the forest edge was replaced
+
+    # benchmark: stream of new edges, DynamicMST update vs full recomputation
+    n, m, stream = 5000, 25000, 200
+    rnd = random.Random(5)
+    big = Graph()
+    nodes = [big.insert_vertex(i) for i in range(n)]
+    for i in range(1, n):  # random spanning tree so the graph is connected
+        big.insert_edge(nodes[i], nodes[rnd.randrange(i)], rnd.randint(1, 1000))
+    while big.edge_count() < m:
+        a, b = rnd.sample(nodes, 2)
+        big.insert_edge(a, b, rnd.randint(1, 1000))
+    dynamic = DynamicMST(big)
+    new_edges = []
+    for _ in range(stream):
+        a, b = rnd.sample(nodes, 2)
+        if big.get_edge(a, b) is None:
+            new_edges.append((a, b, rnd.randint(1, 1000)))
+    print(f"{n} vertices, {m} edges, {len(new_edges)} insertions")
+
+    start = time.perf_counter()
+    for a, b, w in new_edges[:5]:
+        mst_kruskal(big)
+    recompute = (time.perf_counter() - start) / 5
+    print(f"{'mst_kruskal recomputation':>26}: {recompute * 1000:9.3f} ms/insertion")
+    start = time.perf_counter()
+    for a, b, w in new_edges:
+        dynamic.insert_edge(big.insert_edge(a, b, w))
+    update = (time.perf_counter() - start) / len(new_edges)
+    print(f"{'DynamicMST.insert_edge':>26}: {update * 1000:9.3f} ms/insertion")
+    assert dynamic.weight() == sum(e.element() for e in mst_kruskal(big))
+
+    # benchmark: one large random graph, Boruvka rounds split among processes
+    n, m = 200_000, 2_000_000
+    from csr_graph import CSRGraph
+
+    sparse = CSRGraph.from_arrays(n, [rnd.randrange(n) for _ in range(m)], [rnd.randrange(n) for _ in range(m)],
+                                  [rnd.random() for _ in range(m)])
+    print(f"{n} vertices, {m} edges")
+    start = time.perf_counter()
+    expected = sum(e.element() for e in mst_kruskal(sparse))
+    print(f"{'mst_kruskal':>26}: {time.perf_counter() - start:.2f} s")
+    for workers in (1, 4):
+        start = time.perf_counter()
+        total = sum(e.element() for e in mst_boruvka(sparse, workers=workers))
+        print(f"{f'mst_boruvka({workers} workers)':>26}: {time.perf_counter() - start:.2f} s")
+        assert abs(total - expected) < 1e-6 * expected
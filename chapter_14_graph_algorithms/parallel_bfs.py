@@ -0,0 +1,263 @@
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+
+from base import Graph, Vertex
+from bfs import simpleBFS
+from csr_graph import CSRGraph
+
+ALPHA = 14  # switch to bottom-up when the frontier has more than 1/ALPHA of the unexplored edges
+BETA = 24  # switch back to top-down when the frontier has less than 1/BETA of the vertices
+
+
+def _top_down(offsets, targets, parent, queue, lo, hi):
+    """Return (0, v, u, i) for every edge i = (u, v) from queue[lo:hi] to an undiscovered vertex, in queue order"""
+    found = []
+    for k in range(lo, hi):
+        u = queue[k]
+        for i in range(offsets[u], offsets[u + 1]):
+            v = targets[i]
+            if parent[v] < 0:
+                found.append((0, v, u, i))
+    return found
+
+
+def _bottom_up(offsets, sources, slots, parent, frontier, lo, hi):
+    """
+    Return (key, v, u, i) for every undiscovered v in [lo, hi) and an incoming edge i = (u, v) from the
+    frontier. Without slots, it is the first one found, with key 0 and i -1. Otherwise slots gives the
+    position of each incoming edge in the rows of the graph, and it is the edge a top-down step would have
+    found first: the one with the smallest key, frontier position of u then position i.
+    """
+    found = []
+    arcs = offsets[-1]
+    for v in range(lo, hi):
+        if parent[v] < 0 and slots is None:
+            for j in range(offsets[v], offsets[v + 1]):
+                if frontier[sources[j]]:
+                    found.append((0, v, sources[j], -1))
+                    break
+        elif parent[v] < 0:
+            best = -1
+            for j in range(offsets[v], offsets[v + 1]):
+                position = frontier[sources[j]]
+                if position:
+                    key = (position - 1) * arcs + int(slots[j])
+                    if best < 0 or key < best:
+                        best, u = key, sources[j]
+            if best >= 0:
+                found.append((best, v, u, best % arcs))
+    return found
+
+
+_forward = None  # graph attached by each worker process
+_backward = None  # its reversed arcs, used by bottom-up steps
+_state = None  # (parent, queue, frontier) views of the shared search state
+
+
+def _map_state(block, n):
+    """Return the parent, queue and frontier views of a shared search state block"""
+    base = block.buf
+    views = [base[:8 * n], base[8 * n:16 * n], base[16 * n:24 * n]]
+    return [view.cast("q") for view in views], views
+
+
+def _attach(forward, backward, state_name, n):
+    """Worker initializer: map the shared graph and search state once per process"""
+    global _forward, _backward, _state
+    _forward = CSRGraph.attach(forward)
+    _backward = CSRGraph.attach(backward) if backward is not None else _forward
+    block = shared_memory.SharedMemory(name=state_name)
+    _state, views = _map_state(block, n)
+
+    def close():
+        for view in _state + views:
+            view.release()
+        block.close()
+        _forward.close()
+        _backward.close()
+
+    util.Finalize(None, close, exitpriority=10)
+
+
+def _worker_step(top_down, exact, lo, hi):
+    """Worker task: run one chunk of a top-down or bottom-up step on the shared graph"""
+    parent, queue, frontier = _state
+    if top_down:
+        return _top_down(*_forward.csr_arrays()[:2], parent, queue, lo, hi)
+    offsets, sources, slots = _backward.csr_arrays()
+    return _bottom_up(offsets, sources, slots if exact else None, parent, frontier, lo, hi)
+
+
+def parallel_bfs(g: Graph, s: Vertex, discovered: dict, workers=None, alpha=ALPHA, beta=BETA):
+    """
+    Compute a BFS from s level by level, splitting each level among worker processes.
+
+    Fills discovered like simpleBFS: discovered[v] = discovered[u] + weight of edge (u, v) for the
+    edge (u, v) that discovered v, and vertices already in discovered are not visited again. The
+    weights are those of the CSR snapshot, so the distances are floats (weights that are None count
+    as 1.0).
+
+    The graph is copied once into shared memory as a CSR snapshot, together with its reversed arcs,
+    the array of BFS parents, the current frontier as a list and the position of each vertex in it.
+    Each level is expanded either top-down (workers scan the outgoing edges of a slice of the frontier)
+    or bottom-up (workers scan the incoming edges of a range of undiscovered vertices), whichever
+    inspects fewer edges. The main process merges the results of each level.
+
+    When all weights are equal, the distance of a vertex only depends on its level and a bottom-up
+    step stops at the first incoming edge from the frontier. Otherwise the parent matters: a bottom-up
+    step scans every incoming edge to keep the one that comes first in frontier order, and sorts the
+    vertices it finds in that order, so every vertex gets the parent and the position in the next
+    frontier that simpleBFS gives it. Such full scans only pay off when the frontier has more edges
+    than the unexplored vertices, so alpha is capped at 1.
+
+    :param g: a Graph or CSRGraph
+    :param s: the start vertex, already in discovered
+    :param discovered: dictionary mapping each discovered vertex to its distance along the BFS tree
+    :param workers: number of worker processes, os.cpu_count() by default, 1 to stay in process
+    :param alpha: top-down to bottom-up switching parameter
+    :param beta: bottom-up to top-down switching parameter
+    :return: None
+    """
+    csr = g if isinstance(g, CSRGraph) else CSRGraph.from_graph(g)
+    n = csr.vertex_count()
+    offsets, targets, weights = csr.csr_arrays()
+    if weights is None or len(weights) == 0 or min(weights) == max(weights):
+        uniform = 1.0 if weights is None or len(weights) == 0 else weights[0]
+        reverse = csr.transpose()
+    else:
+        uniform = None
+        alpha = min(alpha, 1)
+        sources = array("q", bytes(8 * len(targets)))  # origin of each arc
+        for u in range(n):
+            for i in range(offsets[u], offsets[u + 1]):
+                sources[i] = u
+        # every arc u -> v stored in the row of v, with its position in the rows of csr as weight
+        reverse = CSRGraph.from_arrays(n, targets, sources, array("d", range(len(targets))), True)
+    exact = uniform is None
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    forward = backward = block = pool = None
+    state, views = [], []
+    try:
+        if workers > 1:
+            forward = csr.to_shared_memory()
+            backward = reverse.to_shared_memory() if reverse is not csr else None
+            block = shared_memory.SharedMemory(create=True, size=24 * n)
+            state, views = _map_state(block, n)
+            pool = ProcessPoolExecutor(workers, initializer=_attach,
+                                       initargs=(forward.descriptor(), backward and backward.descriptor(),
+                                                 block.name, n))
+
+            def step(top_down, lo, hi):
+                chunk = max(1, (hi - lo + workers * 4 - 1) // (workers * 4))
+                tasks = [pool.submit(_worker_step, top_down, exact, i, min(i + chunk, hi))
+                         for i in range(lo, hi, chunk)]
+                return [found for task in tasks for found in task.result()]
+        else:
+            state = [array("q", [0]) * n, array("q", [0]) * n, array("q", [0]) * n]
+
+            def step(top_down, lo, hi):
+                if top_down:
+                    return _top_down(offsets, targets, parent, queue, lo, hi)
+                offsets_in, sources, slots = reverse.csr_arrays()
+                return _bottom_up(offsets_in, sources, slots if exact else None, parent, frontier, lo, hi)
+        parent, queue, frontier = state
+
+        src = csr.index(s)
+        distance = {src: discovered[s]}
+        unexplored = offsets[n]  # edges leaving undiscovered vertices
+        for i in range(n):
+            parent[i] = -1
+        for v in discovered:
+            i = csr.index(v)
+            parent[i] = i
+            unexplored -= offsets[i + 1] - offsets[i]
+        parent[src] = src
+        queue[0] = src
+        size = 1
+        top_down = True
+
+        while size > 0:
+            frontier_edges = sum(offsets[queue[k] + 1] - offsets[queue[k]] for k in range(size))
+            if top_down and frontier_edges > unexplored / alpha:
+                top_down = False
+            elif not top_down and size < n / beta:
+                top_down = True
+
+            if top_down:
+                found = step(True, 0, size)
+            else:
+                for k in range(size):
+                    frontier[queue[k]] = k + 1
+                found = step(False, 0, n)
+                for k in range(size):
+                    frontier[queue[k]] = 0
+                if exact:
+                    found.sort()
+
+            size = 0
+            for _, v, u, i in found:
+                if parent[v] < 0:
+                    parent[v] = u
+                    distance[v] = distance[u] + (weights[i] if uniform is None else uniform)
+                    queue[size] = v
+                    size += 1
+                    unexplored -= offsets[v + 1] - offsets[v]
+
+        for v, d in distance.items():
+            x = csr.vertex(v)
+            if x not in discovered:
+                discovered[x] = d
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if block is not None:
+            for view in state + views:
+                view.release()
+            block.close()
+            block.unlink()
+        if forward is not None:
+            forward.close(unlink=True)
+        if backward is not None:
+            backward.close(unlink=True)
+
+
+if __name__ == '__main__':
+    g = Graph()
+    v1 = g.insert_vertex(7)
+    v2 = g.insert_vertex(13)
+    v3 = g.insert_vertex(3)
+    v4 = g.insert_vertex(4)
+    v5 = g.insert_vertex(5)
+
+    g.insert_edge(v1, v3, 1)
+    g.insert_edge(v2, v1, 1)
+    g.insert_edge(v3, v2, 1)
+    g.insert_edge(v1, v4, 1)
+    g.insert_edge(v4, v5, 1)
+
+    discovered = {v1: 0}
+    parallel_bfs(g, v1, discovered, workers=2)
+    print(discovered)  # {7: 0, 13: 1.0, 3: 1.0, 4: 1.0, 5: 2.0}
+
+    # benchmark on a random graph with a small diameter, where bottom-up steps pay off
+    n, m = 200_000, 2_000_000
+    rnd = random.Random(1)
+    big = CSRGraph.from_arrays(n, [rnd.randrange(n) for _ in range(m)], [rnd.randrange(n) for _ in range(m)],
+                               [1.0] * m)
+    print(f"random graph: {n} vertices, {m} edges")
+    start = time.perf_counter()
+    expected = {0: 0}
+    simpleBFS(big, 0, expected)
+    print(f"{'simpleBFS':>24}: {time.perf_counter() - start:.2f} s")
+    for workers in (1, 4):
+        start = time.perf_counter()
+        levels = {0: 0}
+        parallel_bfs(big, 0, levels, workers=workers)
+        print(f"{f'parallel_bfs({workers} workers)':>24}: {time.perf_counter() - start:.2f} s")
+        assert levels == expected
@@ -0,0 +1,340 @@
+import random
+import time
+from array import array
+
+from base import Graph, Vertex
+from dfs import tarjan_scc, path
+
+
+class ReachabilityIndex:
+    """
+    Index answering "is there a path from u to v" on a large directed graph that changes slowly.
+
+    Queries run on the condensation DAG, where every component gets three kinds of labels:
+
+    - a topological rank: u can only reach v if rank[u] < rank[v];
+    - for each of a few DFS traversals, an interval [low, high] where high is the post-order number of the
+      component and low the smallest one among its descendants: u can only reach v if the interval of u
+      contains the interval of v;
+    - the pre-order interval of the component in the spanning forest of the first traversal: u reaches
+      every component of its own DFS subtree.
+
+    Most queries are settled by these O(1) tests. The others run a bidirectional BFS that skips every
+    component the labels rule out. Building takes O(n + m) time per traversal and O(k) space for
+    k components, instead of the O(k^2) bits of a TransitiveClosure.
+
+    insert_vertex and insert_edge update the graph and the labels incrementally, merging the components
+    of a new cycle in place; any other change of the graph makes the next query rebuild the index.
+    """
+
+    def __init__(self, g: Graph, labelings=2):
+        """
+        :param g: a directed Graph (on an undirected graph, components are connected components)
+        :param labelings: number of DFS traversals giving [low, high] intervals
+        """
+        self._g = g
+        self._labelings = labelings
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute the components and all labels from the graph, in O(n + m) time per labeling"""
+        g = self._g
+        self._comp, k = tarjan_scc(g)
+        succ = [set() for _ in range(k)]  # condensation edges
+        pred = [set() for _ in range(k)]
+        members = [[] for _ in range(k)]
+        for v, c in self._comp.items():
+            members[c].append(v)
+        for c in range(k):
+            for u in members[c]:
+                for e in g.incident_edges(u):
+                    d = self._comp[e.opposite(u)]
+                    if d != c:
+                        succ[c].add(d)
+                        pred[d].add(c)
+        self._succ, self._pred, self._members = succ, pred, members
+        self._count = k
+        self._rank = array("q", range(k - 1, -1, -1))  # Tarjan numbers components in reverse topological order
+        self._pre = array("q", bytes(8 * k))
+        self._size = array("q", bytes(8 * k))
+        self._low, self._high = [], []
+        for t in range(self._labelings):
+            post = self._traverse(t, t == 0)
+            low = array("q", post)
+            for c in range(k):  # successors have smaller numbers, their low is final
+                for d in succ[c]:
+                    if low[d] < low[c]:
+                        low[c] = low[d]
+            self._low.append(low)
+            self._high.append(post)
+        self._next = k  # next rank, pre-order and post-order number for new components
+        self._version = g.version()
+
+    def _traverse(self, t, tree):
+        """
+        Run a DFS of the condensation from its sources in topological order, visiting successors in natural order
+        for even t and in reverse order for odd t. Return the post-order number of every component, and fill the
+        pre-order intervals of the spanning forest if tree is True.
+        """
+        succ = self._succ
+        k = len(succ)
+        post = array("q", [-1]) * k
+        pre_count = post_count = 0
+        for root in range(k - 1, -1, -1):
+            if post[root] >= 0:
+                continue
+            if tree:
+                self._pre[root] = pre_count
+                pre_count += 1
+            post[root] = -2  # on the stack
+            stack = [(root, iter(succ[root] if t % 2 == 0 else reversed(list(succ[root]))))]
+            while stack:
+                c, children = stack[-1]
+                for d in children:
+                    if post[d] == -1:
+                        if tree:
+                            self._pre[d] = pre_count
+                            pre_count += 1
+                        post[d] = -2
+                        stack.append((d, iter(succ[d] if t % 2 == 0 else reversed(list(succ[d])))))
+                        break
+                else:
+                    stack.pop()
+                    post[c] = post_count
+                    post_count += 1
+                    if tree:
+                        self._size[c] = pre_count - self._pre[c]
+        return post
+
+    def _check(self):
+        """Rebuild the index if the graph changed behind its back"""
+        if self._g.version() != self._version:
+            self.rebuild()
+
+    def component_count(self):
+        """Return the number of strongly connected components of the graph"""
+        self._check()
+        return self._count
+
+    def _excluded(self, c, d):
+        """Return True if the labels prove that component c does not reach component d"""
+        if self._rank[c] > self._rank[d]:
+            return True
+        for low, high in zip(self._low, self._high):
+            if low[d] < low[c] or high[d] > high[c]:
+                return True
+        return False
+
+    def _in_tree(self, c, d):
+        """Return True if d is in the DFS subtree of c, hence reachable from c"""
+        return self._pre[c] <= self._pre[d] < self._pre[c] + self._size[c]
+
+    def reachable(self, u: Vertex, v: Vertex):
+        """Return True if there is a path from u to v (every vertex reaches itself)"""
+        self._check()
+        c, d = self._comp[u], self._comp[v]
+        if c == d or self._in_tree(c, d):
+            return True
+        if self._excluded(c, d):
+            return False
+        return self._search(c, d)
+
+    def _search(self, c, d):
+        """
+        Bidirectional BFS from c forwards and from d backwards on the condensation, expanding the smaller frontier,
+        that never enters a component the labels exclude from every path from c to d.
+        """
+        forward, backward = {c}, {d}
+        front, back = [c], [d]
+        while front and back:
+            if len(front) <= len(back):
+                following = []
+                for x in front:
+                    for y in self._succ[x]:
+                        if y in backward or self._in_tree(y, d):
+                            return True
+                        if y not in forward and not self._excluded(y, d):
+                            forward.add(y)
+                            following.append(y)
+                front = following
+            else:
+                following = []
+                for x in back:
+                    for y in self._pred[x]:
+                        if y in forward or self._in_tree(c, y):
+                            return True
+                        if y not in backward and not self._excluded(c, y):
+                            backward.add(y)
+                            following.append(y)
+                back = following
+        return False
+
+    def insert_vertex(self, x=None) -> Vertex:
+        """Insert a new vertex with element x into the graph and the index, and return it"""
+        self._check()
+        v = self._g.insert_vertex(x)
+        c = len(self._succ)
+        self._comp[v] = c
+        self._members.append([v])
+        self._count += 1
+        self._succ.append(set())
+        self._pred.append(set())
+        self._rank.append(self._next)  # an isolated component fits anywhere in the topological order
+        self._pre.append(self._next)
+        self._size.append(1)
+        for low, high in zip(self._low, self._high):
+            low.append(self._next)
+            high.append(self._next)
+        self._next += 1
+        self._version = self._g.version()
+        return v
+
+    def insert_edge(self, u: Vertex, v: Vertex, x=None):
+        """
+        Insert an edge from u to v with element x into the graph and update the index.
+
+        If rank[u] > rank[v], the ranks are repaired with the algorithm of Pearce and Kelly, which only moves the
+        components ranked between v and u; if v reaches u, the components on the new cycles are merged into one.
+        Then the intervals of u (or of the merged component) and of its ancestors are widened to contain the
+        intervals of their new descendants, stopping at the ancestors that already contain them.
+        :return: the new edge
+        """
+        self._check()
+        e = self._g.insert_edge(u, v, x)
+        self._version = self._g.version()
+        c, d = self._comp[u], self._comp[v]
+        if c == d or d in self._succ[c]:
+            return e
+        if not self._g.is_directed():
+            self._merge({c, d})  # an undirected edge between components merges them
+            return e
+        if self._rank[c] > self._rank[d]:
+            rank = self._rank
+            lower, upper = rank[d], rank[c]
+            after = self._collect(d, self._succ, rank, lower, upper)  # must move after c
+            before = self._collect(c, self._pred, rank, lower, upper)  # must move before d
+            cycle = set(after).intersection(before)  # on a path from d to c
+            # reuse the ranks of both groups: the first group moves down, the second one up
+            slots = sorted(rank[y] for y in set(before).union(after))
+            first = sorted((y for y in before if y not in cycle), key=rank.__getitem__)
+            second = sorted((y for y in after if y not in cycle), key=rank.__getitem__)
+            for y, r in zip(first, slots):
+                rank[y] = r
+            for y, r in zip(second, slots[len(slots) - len(second):]):
+                rank[y] = r
+            if cycle:
+                rank[self._merge(cycle)] = slots[len(first)]
+                return e
+        self._succ[c].add(d)
+        self._pred[d].add(c)
+        for low, high in zip(self._low, self._high):
+            self._widen(low, high, [c], low[d], high[d])
+        return e
+
+    def _widen(self, low, high, stack, lo, hi):
+        """Widen the intervals of the components of stack and of their ancestors to contain [lo, hi]"""
+        while stack:
+            a = stack.pop()
+            if low[a] <= lo and high[a] >= hi:
+                continue  # a and its ancestors already contain [lo, hi]
+            low[a] = min(low[a], lo)
+            high[a] = max(high[a], hi)
+            stack.extend(self._pred[a])
+
+    def _merge(self, cycle):
+        """Merge the components of cycle into the largest one and return it"""
+        keep = max(cycle, key=lambda y: len(self._members[y]))
+        succ, pred = self._succ[keep], self._pred[keep]
+        for y in cycle:
+            if y == keep:
+                continue
+            for x in self._succ[y]:
+                if x not in cycle:
+                    self._pred[x].discard(y)
+                    self._pred[x].add(keep)
+            for x in self._pred[y]:
+                if x not in cycle:
+                    self._succ[x].discard(y)
+                    self._succ[x].add(keep)
+            succ |= self._succ[y]
+            pred |= self._pred[y]
+            for v in self._members[y]:
+                self._comp[v] = keep
+            self._members[keep].extend(self._members[y])
+            self._members[y] = []
+            self._succ[y] = set()
+            self._pred[y] = set()
+        succ -= cycle
+        pred -= cycle
+        self._count -= len(cycle) - 1
+        for low, high in zip(self._low, self._high):
+            low[keep] = lo = min(low[y] for y in cycle)
+            high[keep] = hi = max(high[y] for y in cycle)
+            self._widen(low, high, list(pred), lo, hi)  # each contains the interval of some component of cycle
+        return keep
+
+    @staticmethod
+    def _collect(start, adjacency, rank, lower, upper):
+        """Return the components reached from start through components of rank between lower and upper"""
+        found = [start]
+        seen = {start}
+        for x in found:
+            for y in adjacency[x]:
+                if y not in seen and lower <= rank[y] <= upper:
+                    seen.add(y)
+                    found.append(y)
+        return found
+
+
+if __name__ == "__main__":
+    g = Graph(directed=True)
+    v1 = g.insert_vertex(1)
+    v2 = g.insert_vertex(2)
+    v3 = g.insert_vertex(3)
+    v4 = g.insert_vertex(4)
+    v5 = g.insert_vertex(5)
+
+    g.insert_edge(v1, v3)
+    g.insert_edge(v2, v1)
+    g.insert_edge(v3, v2)
+    g.insert_edge(v1, v4)
+    g.insert_edge(v4, v5)
+
+    index = ReachabilityIndex(g)
+    print(index.component_count())  # 3
+    print(index.reachable(v2, v5), index.reachable(v5, v2))  # True False
+    v6 = index.insert_vertex(6)
+    index.insert_edge(v6, v2)
+    print(index.reachable(v6, v5), index.reachable(v1, v6))  # True False
+    index.insert_edge(v5, v6)  # closes a cycle: all components merge
+    print(index.reachable(v5, v4), index.component_count())  # True 1
+
+    # benchmark: random queries on a sparse random digraph, answered by path() and by the index
+    n, m = 100_000, 150_000
+    rnd = random.Random(22)
+    big = Graph(directed=True)
+    nodes = [big.insert_vertex(i) for i in range(n)]
+    for _ in range(m):
+        a, b = rnd.randrange(n), rnd.randrange(n)
+        if a != b:
+            big.insert_edge(nodes[a], nodes[b])
+    queries = [(rnd.choice(nodes), rnd.choice(nodes)) for _ in range(100)]
+    start = time.perf_counter()
+    expected = [path(big, a, b) for a, b in queries]
+    print(f"{'path() per query':>24}: {(time.perf_counter() - start) / len(queries) * 1000:.3f} ms")
+    start = time.perf_counter()
+    index = ReachabilityIndex(big)
+    print(f"{'ReachabilityIndex build':>24}: {time.perf_counter() - start:.2f} s, {index.component_count()} components")
+    start = time.perf_counter()
+    answers = [index.reachable(a, b) for a, b in queries * 100]
+    print(f"{'index per query':>24}: {(time.perf_counter() - start) / len(answers) * 1000:.3f} ms")
+    assert answers[:len(queries)] == expected
+    start = time.perf_counter()
+    for _ in range(200):  # random edges are the worst case: they span most of the topological order
+        a, b = rnd.randrange(n), rnd.randrange(n)
+        if a != b and big.get_edge(nodes[a], nodes[b]) is None:
+            index.insert_edge(nodes[a], nodes[b])
+    print(f"{'insert_edge':>24}: {(time.perf_counter() - start) / 200 * 1000:.3f} ms, "
+          f"{index.component_count()} components")
+    answers = [index.reachable(a, b) for a, b in queries]
+    assert answers == [path(big, a, b) for a, b in queries]
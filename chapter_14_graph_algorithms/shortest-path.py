@@ -1,22 +1,40 @@
+import math
+import random
+import time
+from collections import deque
+from heapq import heappush, heappop
+from itertools import count
+
 from base import Graph, Vertex
 from chapter_9_priority_queues import AdaptableHeapPriorityQueue
 
 
+class NegativeCycleError(ValueError):
+    """Error raised when shortest paths are not defined because of a cycle of negative weight."""
+
+    def __init__(self, cycle):
+        super().__init__(f"graph has a negative cycle: {cycle}")
+        self.cycle = cycle  # vertices of the cycle, each one with an edge to the next and the last to the first
+
+
 def simple_shortest_path(g: Graph, src: Vertex):
     """
     Compute the shortest path distances from src to reachable vertices of g
 
-    :param g: a graph that can be directed or undirected
+    :param g: a graph that can be directed or undirected, with non-negative edge weights (ValueError otherwise)
     :param src: the source vertex
     :return: a dictionary mapping each reachable vertex to its distance from source
     """
+    if g.is_indexed():
+        return _indexed_shortest_path(g, src)
+
     d = {}  # d[v] is the upper bound from s to v
     cloud = {}  # map reachable v to its d[v] value
     pq = AdaptableHeapPriorityQueue()  # vertex v will have key d[v]
     pq_locator = {}
     # intitialize
     for v in g.vertices():
-        if v is src:
+        if v == src:
             d[v] = 0
         else:
             d[v] = float("inf")
@@ -29,12 +47,316 @@ def simple_shortest_path(g: Graph, src: Vertex):
             v = e.opposite(u)
             if v not in cloud:
                 w = e.element()
+                if w < 0:
+                    raise ValueError("negative edge weight, use bellman_ford")
                 if d[u] + w < d[v]:
                     d[v] = d[u] + w
                     pq.update(pq_locator[v], d[v], v)
     return cloud
 
 
+def _indexed_shortest_path(g: Graph, src: Vertex):
+    """simple_shortest_path for an indexed graph: bounds and locators in lists, weights from g.weights()"""
+    weights = g.weights()
+    d = [float("inf")] * g.vertex_count()
+    d[src.index()] = 0
+    cloud = {}
+    pq = AdaptableHeapPriorityQueue()
+    pq_locator = [None] * g.vertex_count()  # None once the vertex is in the cloud
+    for v in g.vertices():
+        pq_locator[v._index] = pq.add(d[v._index], v)
+    while not pq.is_empty():
+        k, u = pq.remove_min()
+        cloud[u] = k
+        pq_locator[u._index] = None
+        for e in g.incident_edges(u):
+            i = e.opposite(u)._index
+            if pq_locator[i] is not None:
+                w = weights[e._index]
+                if w < 0:
+                    raise ValueError("negative edge weight, use bellman_ford")
+                if k + w < d[i]:
+                    d[i] = k + w
+                    pq.update(pq_locator[i], d[i], g.vertex(i))
+    return cloud
+
+
+def dijkstra(g: Graph, src: Vertex, targets=None, max_distance=None, weight=None):
+    """
+    Compute shortest path distances from src using a binary heap with lazy deletion.
+
+    Only discovered vertices are pushed on the heap. When the bound of a vertex improves it is
+    pushed again and the outdated entries are skipped when popped, so the cost depends on the
+    explored part of the graph only.
+
+    :param g: a graph that can be directed or undirected, with non-negative edge weights
+    :param src: the source vertex
+    :param targets: optional collection of vertices, the search stops once all of them are settled
+    :param max_distance: optional radius, vertices farther than max_distance from src are not settled
+    :param weight: optional function giving the weight of an edge, e.element() by default;
+                   ValueError is raised on a negative weight
+    :return: a pair (cloud, tree) where cloud maps each settled vertex to its distance from src
+             and tree maps each settled vertex other than src to the edge used to reach it
+    """
+    d = {src: 0}  # d[v] is the best known bound from src to v
+    tree = {}  # tree[v] is the edge that gave the bound d[v]
+    cloud = {}
+    remaining = None if targets is None else set(targets)
+    tie = count()  # vertices are not comparable, break ties by insertion order
+    heap = [(0, next(tie), src)]
+
+    while heap:
+        k, _, u = heappop(heap)
+        if u in cloud:
+            continue  # outdated entry
+        if max_distance is not None and k > max_distance:
+            break
+        cloud[u] = k
+        if remaining is not None:
+            remaining.discard(u)
+            if not remaining:
+                break
+        for e in g.incident_edges(u):
+            v = e.opposite(u)
+            if v not in cloud:
+                c = e.element() if weight is None else weight(e)
+                if c < 0:
+                    raise ValueError("negative edge weight, use bellman_ford")
+                w = k + c
+                if v not in d or w < d[v]:
+                    d[v] = w
+                    tree[v] = e
+                    heappush(heap, (w, next(tie), v))
+
+    return cloud, {v: tree[v] for v in cloud if v in tree}
+
+
+def _walk_back(tree, v, stop):
+    """Return the edges of tree on the way from v back to stop, in walking order"""
+    path = []
+    while v != stop:
+        e = tree[v]
+        path.append(e)
+        v = e.opposite(v)
+    return path
+
+
+def bidirectional_dijkstra(g: Graph, src: Vertex, dst: Vertex):
+    """
+    Compute a shortest path from src to dst by growing one cloud from src and one from dst.
+
+    The backward search follows incoming edges, using g.transpose() when g is directed. The
+    smaller frontier is expanded at each step and the search stops as soon as the two smallest
+    keys add up to at least the best path found so far, so usually much less than the full
+    graph is explored.
+
+    :param g: a graph that can be directed or undirected, with non-negative edge weights (ValueError otherwise)
+    :param src: the source vertex
+    :param dst: the destination vertex
+    :return: the list of edges of a shortest path from src to dst, or None if dst is not reachable
+    """
+    if src == dst:
+        return []
+    graphs = (g, g.transpose())
+    d = ({src: 0}, {dst: 0})
+    tree = ({}, {})
+    cloud = (set(), set())
+    tie = count()
+    heaps = ([(0, next(tie), src)], [(0, next(tie), dst)])
+    best = float("inf")
+    meet = None
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        k, _, u = heappop(heaps[side])
+        if u in cloud[side]:
+            continue
+        cloud[side].add(u)
+        dist, other = d[side], d[1 - side]
+        for e in graphs[side].incident_edges(u):
+            v = e.opposite(u)
+            if e.element() < 0:
+                raise ValueError("negative edge weight, use bellman_ford")
+            w = k + e.element()
+            if v not in dist or w < dist[v]:
+                dist[v] = w
+                tree[side][v] = e
+                heappush(heaps[side], (w, next(tie), v))
+                if v in other and w + other[v] < best:
+                    best = w + other[v]
+                    meet = v
+
+    if meet is None:
+        return None
+    path = _walk_back(tree[0], meet, src)
+    path.reverse()
+    path.extend(_walk_back(tree[1], meet, dst))
+    return path
+
+
+def euclidean(u: Vertex, v: Vertex):
+    """A* heuristic for vertices whose elements are coordinates and edges weighted by distance"""
+    return math.dist(u.element(), v.element())
+
+
+def a_star(g: Graph, src: Vertex, dst: Vertex, heuristic=None):
+    """
+    Compute a shortest path from src to dst with the A* algorithm.
+
+    Vertices are explored by increasing d[v] + heuristic(v, dst). The heuristic must be
+    admissible, that is never overestimate the distance from v to dst; if it is not also
+    consistent, a vertex is reopened when a shorter path to it is found.
+
+    :param g: a graph that can be directed or undirected, with non-negative edge weights (ValueError otherwise)
+    :param src: the source vertex
+    :param dst: the destination vertex
+    :param heuristic: function (v, dst) returning a lower bound on the distance from v to dst,
+                      None behaves like Dijkstra's algorithm
+    :return: the list of edges of a shortest path from src to dst, or None if dst is not reachable
+    """
+    if heuristic is None:
+        heuristic = lambda v, t: 0
+    d = {src: 0}
+    tree = {}
+    tie = count()
+    heap = [(heuristic(src, dst), next(tie), 0, src)]
+
+    while heap:
+        _, _, k, u = heappop(heap)
+        if k > d[u]:
+            continue  # outdated entry
+        if u == dst:
+            path = _walk_back(tree, dst, src)
+            path.reverse()
+            return path
+        for e in g.incident_edges(u):
+            v = e.opposite(u)
+            if e.element() < 0:
+                raise ValueError("negative edge weight, use bellman_ford")
+            w = k + e.element()
+            if v not in d or w < d[v]:
+                d[v] = w
+                tree[v] = e
+                heappush(heap, (w + heuristic(v, dst), next(tie), w, v))
+    return None
+
+
+def _spfa(g: Graph, sources):
+    """
+    Bellman-Ford with a FIFO queue of the vertices whose bound changed (SPFA), all sources at distance 0.
+
+    A vertex whose bound comes from a path of n edges or more proves a negative cycle, found by
+    walking the tree edges back from it, or anywhere among the tree edges once it has formed.
+    """
+    n = g.vertex_count()
+    d = {}
+    tree = {}
+    edges = {}  # edges[v] is the number of edges of the path that gave the bound d[v]
+    queue = deque()
+    for s in sources:
+        d[s] = 0
+        edges[s] = 0
+        queue.append(s)
+    queued = set(queue)
+
+    while queue:  # stops as soon as a whole pass changes nothing
+        u = queue.popleft()
+        queued.discard(u)
+        k = d[u]
+        for e in g.incident_edges(u):
+            v = e.opposite(u)
+            w = k + e.element()
+            if v not in d or w < d[v]:
+                d[v] = w
+                tree[v] = e
+                edges[v] = edges[u] + 1
+                if edges[v] >= n:
+                    cycle = _tree_cycle(tree, v) or _tree_cycle_anywhere(tree)
+                    if cycle is not None:
+                        raise NegativeCycleError(cycle)
+                if v not in queued:
+                    queued.add(v)
+                    queue.append(v)
+    return d, tree
+
+
+def _tree_cycle(tree, v, seen=None):
+    """
+    Return the cycle reached by walking the tree edges back from v, in edge direction, or None if the walk
+    reaches a vertex without tree edge (a source) or a vertex of seen
+    """
+    position = {}
+    path = []
+    while v not in position:
+        if v not in tree or (seen is not None and v in seen):
+            if seen is not None:
+                seen.update(path)
+            return None
+        position[v] = len(path)
+        path.append(v)
+        v = tree[v].opposite(v)
+    cycle = path[position[v]:]
+    cycle.reverse()
+    return cycle
+
+
+def _tree_cycle_anywhere(tree):
+    """
+    Return a cycle of the tree edges, or None. With several sources the walk back from the vertex that
+    proved a negative cycle can end at a source, the cycle being elsewhere among the tree edges, or not
+    formed yet: the bounds then keep decreasing, which an acyclic tree can not allow for long.
+    """
+    seen = set()
+    for v in tree:
+        if v not in seen:
+            cycle = _tree_cycle(tree, v, seen)
+            if cycle is not None:
+                return cycle
+    return None
+
+
+def bellman_ford(g: Graph, src: Vertex):
+    """
+    Compute shortest path distances from src when some edge weights are negative.
+
+    Uses the queue-based Bellman-Ford algorithm (SPFA): only the edges of vertices whose bound changed
+    are relaxed again, so it stops early when the bounds settle and runs in O(nm) time in the worst case.
+
+    :param g: a directed graph (a negative undirected edge is already a negative cycle)
+    :param src: the source vertex
+    :return: a pair (d, tree) as for dijkstra, for every vertex reachable from src
+    :raise NegativeCycleError: if a cycle of negative weight is reachable from src
+    """
+    return _spfa(g, [src])
+
+
+def johnson(g: Graph, sources=None):
+    """
+    Compute shortest path distances between all pairs of vertices when some edge weights are negative.
+
+    Bellman-Ford from a virtual source linked to every vertex gives potentials h with
+    h(v) <= h(u) + w(u, v), so the reweighted edges w(u, v) + h(u) - h(v) are non-negative and keep
+    the same shortest paths. Each source then runs dijkstra on the reweighted edges, O(nm log n)
+    overall instead of the O(n^3) of Floyd-Warshall on sparse graphs.
+
+    :param g: a directed graph
+    :param sources: iterable of source vertices, all vertices by default
+    :return: generator of (source, d) pairs, d mapping each vertex reachable from source to its distance
+    :raise NegativeCycleError: if g has a cycle of negative weight
+    """
+    h = _spfa(g, g.vertices())[0]
+
+    def reweighted(e):
+        u, v = e.endpoints()
+        return max(0, e.element() + h[u] - h[v])  # rounding errors must not make it negative
+
+    for s in g.vertices() if sources is None else sources:
+        cloud = dijkstra(g, s, weight=reweighted)[0]
+        yield s, {v: k - h[s] + h[v] for v, k in cloud.items()}
+
+
 def shortest_path_tree(g: Graph, s: Vertex, d: dict):
     """
     Reconstruct shortest-path tree rooted at vertex `s`, given distance map d.
@@ -45,7 +367,7 @@ def shortest_path_tree(g: Graph, s: Vertex, d: dict):
     """
     tree = {}
     for v in d:
-        if v is not s:
+        if v != s:
             for e in g.incident_edges(v, False):  # only incoming
                 u = e.opposite(v)
                 w = e.element()
@@ -73,3 +395,91 @@ if __name__ == "__main__":
     tree = shortest_path_tree(g, v1, d)
     print(d)  # {1: 0, 3: 1, 5: 1, 2: 3, 4: 4}
     print(tree)  # {3: 1 -> 3, 5: 5 -> 1, 2: 3 -> 2, 4: 4 -> 5}
+
+    d, tree = dijkstra(g, v1, targets=[v2])
+    print(d)  # {1: 0, 3: 1, 5: 1, 2: 3}
+    print(tree)  # {3: 1 -> 3, 5: 5 -> 1, 2: 3 -> 2}
+    print(dijkstra(g, v1, max_distance=1)[0])  # {1: 0, 3: 1, 5: 1}
+    print(bidirectional_dijkstra(g, v1, v2))  # [1 -> 3, 3 -> 2]
+    print(a_star(g, v1, v2))  # [1 -> 3, 3 -> 2]
+
+    dg = Graph(directed=True)
+    w1 = dg.insert_vertex(1)
+    w2 = dg.insert_vertex(2)
+    w3 = dg.insert_vertex(3)
+    w4 = dg.insert_vertex(4)
+
+    dg.insert_edge(w1, w2, 4)
+    dg.insert_edge(w1, w3, 2)
+    dg.insert_edge(w3, w2, -3)  # rebate
+    dg.insert_edge(w2, w4, 1)
+    print(bellman_ford(dg, w1)[0])  # {1: 0, 2: -1, 3: 2, 4: 0}
+    print(dict(johnson(dg, [w3])))  # {3: {3: 0, 2: -3, 4: -2}}
+    dg.insert_edge(w4, w3, 1)
+    try:
+        bellman_ford(dg, w1)
+    except NegativeCycleError as error:
+        print(error.cycle)  # [2, 4, 3]
+
+    # from all sources at once, the walk back from the vertex proving the cycle can end at a source
+    cg = Graph(directed=True)
+    c = [cg.insert_vertex(i) for i in range(4)]
+    for i, j, w in ((3, 1, 7), (2, 1, 9), (1, 3, 5), (1, 2, 3), (2, 0, -4), (3, 2, -4), (2, 3, 7), (0, 1, -4)):
+        cg.insert_edge(c[i], c[j], w)
+    try:
+        list(johnson(cg))
+    except NegativeCycleError as error:
+        cycle = error.cycle
+        closing = [cg.get_edge(x, y) for x, y in zip(cycle, cycle[1:] + cycle[:1])]
+        assert None not in closing and sum(e.element() for e in closing) < 0
+        print(cycle)  # [2, 0, 1, 3]
+
+    # point-to-point benchmark on a random geometric (road-like) graph
+    from generators import random_geometric_graph
+
+    n, queries = 20000, 5
+    road = random_geometric_graph(n, seed=7)
+    nodes = list(road.vertices())
+    rnd = random.Random(7)
+    pairs = [tuple(rnd.sample(nodes, 2)) for _ in range(queries)]
+    print(f"random geometric graph: {road.vertex_count()} vertices, {road.edge_count()} edges, {queries} queries")
+
+    def length(edges):
+        return float("inf") if edges is None else sum(e.element() for e in edges)
+
+    timings = {}
+    for name, query in (
+            ("simple_shortest_path", lambda s, t: simple_shortest_path(road, s)[t]),
+            ("dijkstra(targets=)", lambda s, t: dijkstra(road, s, targets=[t])[0].get(t, float("inf"))),
+            ("bidirectional_dijkstra", lambda s, t: length(bidirectional_dijkstra(road, s, t))),
+            ("a_star(euclidean)", lambda s, t: length(a_star(road, s, t, euclidean)))):
+        start = time.perf_counter()
+        timings[name] = [query(s, t) for s, t in pairs]
+        print(f"{name:>24}: {(time.perf_counter() - start) / queries * 1000:9.2f} ms/query")
+    reference = timings["simple_shortest_path"]
+    for name, result in timings.items():
+        assert all(a == b or math.isclose(a, b) for a, b in zip(reference, result)), name
+
+    # all-pairs benchmark with negative weights: Johnson vs Floyd-Warshall
+    from csr_graph import CSRGraph
+    from distance_matrix import floyd_warshall_matrix
+
+    n, m = 400, 2000
+    costs = Graph(directed=True)
+    nodes = [costs.insert_vertex(i) for i in range(n)]
+    potential = [rnd.randint(0, 50) for _ in range(n)]
+    while costs.edge_count() < m:
+        a, b = rnd.sample(range(n), 2)
+        if costs.get_edge(nodes[a], nodes[b]) is None:  # cycles have the weight of the base costs, never negative
+            costs.insert_edge(nodes[a], nodes[b], rnd.randint(0, 20) + potential[a] - potential[b])
+    print(f"random graph with negative weights: {n} vertices, {m} edges")
+    start = time.perf_counter()
+    rows = dict(johnson(costs))
+    print(f"{'johnson':>24}: {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    csr = CSRGraph.from_graph(costs)
+    matrix = floyd_warshall_matrix(csr)
+    print(f"{'floyd_warshall_matrix':>24}: {time.perf_counter() - start:.2f} s")
+    for u, row in rows.items():
+        i = csr.index(u)
+        assert all(matrix[i][csr.index(v)] == k for v, k in row.items())
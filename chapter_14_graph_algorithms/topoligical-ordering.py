@@ -1,36 +1,262 @@
-from queue import Queue
+import random
+import time
+from collections import deque
 
 from base import Graph, Vertex
+from csr_graph import CSRGraph
 
 
-def topological_sort(g: Graph):
+class CycleError(ValueError):
+    """Error raised when a directed graph that must be acyclic has a cycle."""
+
+    def __init__(self, cycle):
+        super().__init__(f"graph has a cycle: {cycle}")
+        self.cycle = cycle  # vertices of the cycle, each one with an edge to the next and the last to the first
+
+
+def topological_sort(g: Graph, heaviest_first=False):
     """
     Sort a graph g in a topological order. If g has cycle the result will be incomplete.
+
+    By default the successors of each vertex are released in the order of its adjacency map, that is
+    the order in which the edges were inserted. With heaviest_first=True they are released by decreasing
+    edge element, the order of the first version of this function, which costs a sort of every adjacency
+    map; a Graph caches these sorted orders, so sorting the same graph again does not sort them again.
     :param g: a DAG
+    :param heaviest_first: True to release the successors of a vertex by decreasing edge element
     :return: a list of vertices of directed acyclic graph g in topological order
     """
 
+    if isinstance(g, CSRGraph) and not heaviest_first:
+        return _csr_waves(g, [])[0]
+    if g.is_indexed():  # in-degrees in a list, the topological order doubles as the FIFO queue
+        incount = [0] * g.vertex_count()
+        for v in g.vertices():
+            incount[v._index] = g.degree(v, False)
+        topo = [v for v in g.vertices() if incount[v._index] == 0]
+        for u in topo:
+            for e in g.incident_edges(u, sorted=heaviest_first, reverse=True):
+                v = e.opposite(u)
+                incount[v._index] -= 1
+                if incount[v._index] == 0:
+                    topo.append(v)
+        return topo
+
     topo = []  # list of vertices in topological order
-    ready = Queue()  # list of vertices that have no remaining constraints
+    ready = deque()  # list of vertices that have no remaining constraints
     incount = {}  # track of in-degree for each vertex
 
     for v in g.vertices():
         incount[v] = g.degree(v, False)  # store number of incoming edges for each vertex v
         if incount[v] == 0:
-            ready.put(v)
-    print(incount)
-    while not ready.empty():
-        u = ready.get()  # u is free of constraints
+            ready.append(v)
+    while ready:
+        u = ready.popleft()  # u is free of constraints
         topo.append(u)
 
-        for e in g.incident_edges(u, outgoing=True, sorted=True, reverse=True):
+        for e in g.incident_edges(u, sorted=heaviest_first, reverse=True):
             v = e.opposite(u)
             incount[v] -= 1  # v has one less constraint without u
             if incount[v] == 0:
-                ready.put(v)
+                ready.append(v)
+    return topo
+
+
+def _csr_waves(g: CSRGraph, waves):
+    """
+    Kahn's algorithm on the arrays of a CSRGraph. The topological order doubles as the FIFO queue.
+    :return: (topological order, in-degree left for each vertex); waves receives the end index of each wave
+    """
+    offsets, targets, _ = g.csr_arrays()
+    incount = [0] * g.vertex_count()
+    for v in targets:
+        incount[v] += 1
+    topo = [v for v, c in enumerate(incount) if c == 0]
+    start = 0
+    while start < len(topo):
+        end = len(topo)
+        waves.append(end)
+        for k in range(start, end):
+            u = topo[k]
+            for i in range(offsets[u], offsets[u + 1]):
+                v = targets[i]
+                incount[v] -= 1
+                if incount[v] == 0:
+                    topo.append(v)
+        start = end
+    return topo, incount
+
+
+def _find_cycle(g: Graph, remaining):
+    """
+    Return a cycle among the vertices of remaining, every one of them having an incoming edge from another one.
+
+    Walk backwards along incoming edges until a vertex repeats, then return the loop in edge direction.
+    """
+    v = next(iter(remaining))
+    position = {}
+    path = []
+    while v not in position:
+        position[v] = len(path)
+        path.append(v)
+        for e in g.incident_edges(v, outgoing=False):
+            u = e.opposite(v)
+            if u in remaining:
+                v = u
+                break
+    cycle = path[position[v]:]
+    cycle.reverse()
+    return cycle
+
+
+def topological_order(g: Graph):
+    """
+    Sort a graph g in a topological order, like topological_sort, but raise CycleError if g has a cycle.
+    :param g: a directed graph
+    :return: a list of vertices of g in topological order
+    """
+    topo = topological_sort(g)
+    if len(topo) < g.vertex_count():
+        placed = set(topo)
+        raise CycleError(_find_cycle(g, {v for v in g.vertices() if v not in placed}))
     return topo
 
 
+def topological_levels(g: Graph):
+    """
+    Generate the vertices of a DAG g in waves: the first wave has the vertices without incoming edges and
+    each following wave the vertices whose predecessors are all in previous waves.
+
+    The vertices of a wave do not depend on each other, so a scheduler can run a whole wave in parallel,
+    and the number of waves is the number of vertices of a longest path.
+    CycleError is raised after the last wave if some vertices are on or after a cycle.
+    :param g: a DAG
+    :return: generator of lists of vertices
+    """
+    if isinstance(g, CSRGraph):
+        waves = []
+        topo, incount = _csr_waves(g, waves)
+        start = 0
+        for end in waves:
+            yield topo[start:end]
+            start = end
+        if len(topo) < len(incount):
+            raise CycleError(_find_cycle(g, {v for v, c in enumerate(incount) if c > 0}))
+        return
+
+    incount = {}
+    wave = []
+    for v in g.vertices():
+        incount[v] = g.degree(v, False)
+        if incount[v] == 0:
+            wave.append(v)
+
+    placed = 0
+    while wave:
+        yield wave
+        placed += len(wave)
+        following = []
+        for u in wave:
+            for e in g.incident_edges(u):
+                v = e.opposite(u)
+                incount[v] -= 1
+                if incount[v] == 0:
+                    following.append(v)
+        wave = following
+
+    if placed < len(incount):
+        raise CycleError(_find_cycle(g, {v for v, c in incount.items() if c > 0}))
+
+
+def _dag_paths(g: Graph, src: Vertex, longest):
+    """Relax the edges of each vertex reachable from src in topological order, keeping the smaller or larger bound"""
+    d = {src: 0}
+    tree = {}
+    for u in topological_order(g):
+        if u not in d:
+            continue  # not reachable from src
+        k = d[u]
+        for e in g.incident_edges(u):
+            v = e.opposite(u)
+            w = k + e.element()
+            if v not in d or (w > d[v] if longest else w < d[v]):
+                d[v] = w
+                tree[v] = e
+    return d, tree
+
+
+def dag_shortest_paths(g: Graph, src: Vertex):
+    """
+    Compute shortest path distances from src in a DAG, in O(n + m) time.
+
+    When vertices are processed in topological order, all edges entering u have been relaxed before u
+    is reached, so its bound is final: no priority queue is needed and negative weights are allowed.
+    :param g: a DAG with weighted edges, CycleError is raised if g has a cycle
+    :param src: the source vertex
+    :return: a pair (d, tree) where d maps each vertex reachable from src to its distance from src
+             and tree maps each of them other than src to the edge used to reach it
+    """
+    return _dag_paths(g, src, False)
+
+
+def dag_longest_paths(g: Graph, src: Vertex):
+    """
+    Compute longest path distances from src in a DAG, in O(n + m) time.
+
+    Same as dag_shortest_paths keeping the larger bound, which is only possible because g has no cycle.
+    :param g: a DAG with weighted edges, CycleError is raised if g has a cycle
+    :param src: the source vertex
+    :return: a pair (d, tree) where d maps each vertex reachable from src to its longest distance from src
+             and tree maps each of them other than src to the last edge of a longest path
+    """
+    return _dag_paths(g, src, True)
+
+
+def critical_path(g: Graph, duration=None):
+    """
+    Schedule the tasks of a DAG g as early as possible and find its critical path, in O(n + m) time.
+
+    Each vertex is a task and each edge (u, v) means that v starts at least e.element() >= 0 time units
+    after u finishes (None counts as 0). A forward pass in topological order gives the earliest start of each
+    task and the length of the schedule, a backward pass the latest start that does not delay it. The slack
+    of a task is the difference: tasks with no slack form the critical path, delaying any of them delays
+    the whole schedule.
+    :param g: a DAG, CycleError is raised if g has a cycle
+    :param duration: function giving the duration of a task, 0 for all tasks by default
+    :return: a tuple (earliest, slack, path) where earliest and slack map each vertex to its earliest start
+             and its slack, and path is the list of the vertices of a critical path
+    """
+    order = topological_order(g)
+    time_of = (lambda v: 0) if duration is None else duration
+    length = {v: time_of(v) for v in order}
+    earliest = dict.fromkeys(order, 0)
+    critical = {}  # critical[v] is the predecessor that determines earliest[v]
+    for u in order:
+        finish = earliest[u] + length[u]
+        for e in g.incident_edges(u):
+            v = e.opposite(u)
+            w = finish + (e.element() or 0)
+            if v not in critical or w > earliest[v]:
+                earliest[v] = w
+                critical[v] = u
+
+    if not order:
+        return {}, {}, []
+    last = max(order, key=lambda v: earliest[v] + length[v])
+    makespan = earliest[last] + length[last]
+    latest = {v: makespan - length[v] for v in order}
+    for u in reversed(order):
+        for e in g.incident_edges(u):
+            v = e.opposite(u)
+            latest[u] = min(latest[u], latest[v] - (e.element() or 0) - length[u])
+
+    path = [last]
+    while path[-1] in critical:
+        path.append(critical[path[-1]])
+    path.reverse()
+    return earliest, {v: latest[v] - earliest[v] for v in order}, path
+
+
 if __name__ == "__main__":
     g = Graph(directed=True)
     v1 = g.insert_vertex(1)
@@ -45,4 +271,41 @@ if __name__ == "__main__":
     g.insert_edge(v4, v5, 1)
 
     cl = topological_sort(g)
-    print(cl)
+    print(cl)  # [1, 3, 2, 4, 5], successors in insertion order
+    print(topological_sort(g, heaviest_first=True))  # [1, 4, 3, 2, 5]
+    cached = g._sorted_out[v1]
+    topological_sort(g, heaviest_first=True)
+    assert g._sorted_out[v1] is cached  # the second sort reuses the sorted adjacency of v1
+    print(list(topological_levels(g)))  # [[1], [3, 2, 4], [5]]
+
+    g.insert_edge(v3, v5, 1)
+    print(dag_shortest_paths(g, v1)[0])  # {1: 0, 3: 5, 2: 3, 4: 7, 5: 6}
+    print(dag_longest_paths(g, v1)[0])  # {1: 0, 3: 5, 2: 3, 4: 7, 5: 8}
+
+    earliest, slack, path = critical_path(g)  # edge weights as activity durations
+    print(earliest)  # {1: 0, 3: 5, 2: 3, 4: 7, 5: 8}
+    print(slack, path)  # {1: 0, 3: 2, 2: 5, 4: 0, 5: 0} [1, 4, 5]
+
+    g.insert_edge(v5, v1)
+    try:
+        topological_order(g)
+    except CycleError as error:
+        print(error.cycle)  # [4, 5, 1]
+
+    # benchmark: random DAG of build tasks, each depending on a few earlier ones
+    n, m = 1_000_000, 4_000_000
+    rnd = random.Random(12)
+    sources, targets = [], []
+    for _ in range(m):
+        a, b = rnd.randrange(n), rnd.randrange(n)
+        if a != b:
+            sources.append(min(a, b))
+            targets.append(max(a, b))
+    dag = CSRGraph.from_arrays(n, sources, targets, directed=True)
+    print(f"random DAG: {n} vertices, {len(sources)} edges")
+    start = time.perf_counter()
+    order = topological_order(dag)
+    print(f"{'topological_order':>20}: {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    waves = sum(1 for _ in topological_levels(dag))
+    print(f"{'topological_levels':>20}: {time.perf_counter() - start:.2f} s, {waves} waves")
@@ -1,20 +1,87 @@
-import copy
-from base import Graph, Vertex
+from base import Graph
+from dfs import tarjan_scc
+
+
+class TransitiveClosure:
+    """
+    Reachability oracle answering "is there a path from u to v" in O(1) time.
+
+    Vertices of a strongly connected component reach exactly the same vertices, so the closure is
+    computed on the condensation DAG only: the reachability row of a component is the bitwise OR of
+    the rows of its successors, stored as one Python integer used as a bitset. Building it takes
+    O(n + m + m' * k / w) time, for k components, m' condensation edges and machine words of w bits,
+    and O(k^2 / 8) bytes.
+    """
+
+    def __init__(self, g: Graph):
+        self._comp, k = tarjan_scc(g)
+        reach = [0] * k
+        for u, c in self._comp.items():  # edges of the condensation
+            for e in g.incident_edges(u):
+                d = self._comp[e.opposite(u)]
+                if d != c:
+                    reach[c] |= 1 << d
+        width = (k + 7) // 8
+        self._rows = []
+        for c in range(k):  # successors of c have smaller numbers, so their rows are complete
+            row = reach[c] | (1 << c)
+            successors = reach[c]
+            while successors:
+                low = successors & -successors
+                row |= reach[low.bit_length() - 1]
+                successors ^= low
+            reach[c] = row
+            self._rows.append(row.to_bytes(width, "little"))
+
+    def component_count(self):
+        """Return the number of strongly connected components of the graph"""
+        return len(self._rows)
+
+    def component(self, v):
+        """Return the number of the strongly connected component of vertex v"""
+        return self._comp[v]
+
+    def reachable(self, u, v):
+        """Return True if there is a path from u to v (every vertex reaches itself)"""
+        d = self._comp[v]
+        return bool(self._rows[self._comp[u]][d >> 3] >> (d & 7) & 1)
 
 
 def floydWarshall(graph: Graph):
-    closure = copy.deepcopy(graph)
+    """
+    Return a new graph with the vertices of graph and an edge (u, v) for every path from u to v.
 
-    vertices = list(closure.vertices())
+    The vertices of the result are new Vertex objects with the same elements. Each row of the
+    adjacency matrix is a Python integer used as a bitset, so step k of the algorithm adds row k
+    to every row having bit k with a single OR, in O(n^3 / w) time overall for w bit words.
+    """
+    closure = Graph(graph.is_directed())
+    vertices = list(graph.vertices())
+    index = {v: i for i, v in enumerate(vertices)}
+    copies = [closure.insert_vertex(v.element()) for v in vertices]
     n = len(vertices)
 
+    rows = [0] * n
+    for i, v in enumerate(vertices):
+        for e in graph.incident_edges(v):
+            j = index[e.opposite(v)]
+            rows[i] |= 1 << j
+            if closure.get_edge(copies[i], copies[j]) is None:
+                closure.insert_edge(copies[i], copies[j], e.element())
+
+    for k in range(n):
+        row_k = rows[k]
+        for i in range(n):
+            if rows[i] >> k & 1:
+                rows[i] |= row_k
+
     for i in range(n):
-        for k in range(n):
-            if i != k and closure.get_edge(vertices[i], vertices[k]) is not None:
-                for j in range(n):
-                    if i != j != k and closure.get_edge(vertices[k], vertices[j]) is not None:
-                        if closure.get_edge(vertices[i], vertices[j]) is None:
-                            closure.insert_edge(vertices[i], vertices[j])
+        bits = bin(rows[i])[:1:-1]  # bits[j] == "1" if vertex j is reachable from vertex i
+        j = bits.find("1")
+        while j != -1:
+            if i != j and closure.get_edge(copies[i], copies[j]) is None:
+                closure.insert_edge(copies[i], copies[j])
+            j = bits.find("1", j + 1)
 
     return closure
 
@@ -35,3 +102,20 @@ if __name__ == "__main__":
 
     cl = floydWarshall(g)
     print(list(cl.edges()))
+
+    dg = Graph(directed=True)
+    w1 = dg.insert_vertex(1)
+    w2 = dg.insert_vertex(2)
+    w3 = dg.insert_vertex(3)
+    w4 = dg.insert_vertex(4)
+    w5 = dg.insert_vertex(5)
+
+    dg.insert_edge(w1, w3)
+    dg.insert_edge(w2, w1)
+    dg.insert_edge(w3, w2)
+    dg.insert_edge(w1, w4)
+    dg.insert_edge(w4, w5)
+
+    tc = TransitiveClosure(dg)
+    print(tc.component_count())  # 3
+    print(tc.reachable(w2, w5), tc.reachable(w5, w2))  # True False
@@ -0,0 +1,185 @@
+import sys
+import time
+from collections import deque
+
+from base import Graph
+
+# kinds of edges reported to the edge visitor
+TREE = "tree"  # edge that discovered a new vertex
+BACK = "back"  # edge to an ancestor in the traversal tree
+FORWARD = "forward"  # edge to an already finished descendant (directed DFS only)
+CROSS = "cross"  # any other edge, for BFS every edge that is not a tree edge
+
+
+def depth_first(g: Graph, sources=None, pre=None, post=None, edge=None, discovered=None):
+    """
+    Perform a DFS of g from each undiscovered source, using an explicit stack instead of recursion.
+
+    The visitors are optional; a visitor returning a true value stops the whole traversal.
+
+    - pre(v, e) is called when v is discovered through edge e (None for a root),
+    - post(v) is called when all edges of v have been explored,
+    - edge(e, u, v, kind) is called for every edge e explored from u to v, kind being TREE, BACK,
+      FORWARD or CROSS. For an undirected graph every non-tree edge is reported once, as BACK.
+      Vertices already in discovered when the traversal starts count as finished earlier, so edges
+      to them are CROSS edges.
+
+    :param g: Graph
+    :param sources: iterable of start vertices, all vertices of g by default
+    :param pre: discovery visitor
+    :param post: finish visitor
+    :param edge: edge visitor
+    :param discovered: dictionary mapping each vertex to the edge that was used to discover it
+                       (None for roots); vertices already in it are not visited again
+    :return: the discovered dictionary
+    """
+    if discovered is None:
+        discovered = {}
+    directed = g.is_directed()
+    order = {}  # discovery rank, only needed to classify edges
+    seeded = set(discovered) if edge is not None else ()  # vertices discovered by the caller
+    finished = set(seeded)
+
+    for s in g.vertices() if sources is None else sources:
+        if s in discovered:
+            continue
+        discovered[s] = None
+        if edge is not None:
+            order[s] = len(order)
+        if pre is not None and pre(s, None):
+            return discovered
+        stack = [s]  # vertices whose edges are being explored
+        pending = [iter(g.incident_edges(s))]  # remaining edges of each vertex of stack
+        parents = {}  # undirected graphs: tree edge not yet seen from the child side
+        while stack:
+            u = stack[-1]
+            for e in pending[-1]:
+                v = e.opposite(u)
+                if v not in discovered:
+                    discovered[v] = e
+                    if edge is not None:
+                        order[v] = len(order)
+                        if edge(e, u, v, TREE):
+                            return discovered
+                        if not directed:
+                            parents[v] = u
+                    if pre is not None and pre(v, e):
+                        return discovered
+                    stack.append(v)
+                    pending.append(iter(g.incident_edges(v)))
+                    break
+                if edge is None:
+                    continue
+                if not directed:
+                    if u in parents and parents[u] == v:
+                        del parents[u]  # the tree edge seen from the child
+                    elif v in seeded:
+                        if edge(e, u, v, CROSS):
+                            return discovered
+                    elif v not in finished and edge(e, u, v, BACK):
+                        return discovered
+                elif v not in finished:
+                    if edge(e, u, v, BACK):
+                        return discovered
+                elif edge(e, u, v, FORWARD if order.get(v, -1) > order[u] else CROSS):
+                    return discovered
+            else:
+                stack.pop()
+                pending.pop()
+                if edge is not None:
+                    finished.add(u)
+                if post is not None and post(u):
+                    return discovered
+    return discovered
+
+
+def breadth_first(g: Graph, sources, pre=None, edge=None, discovered=None):
+    """
+    Perform a BFS of g from the given sources using a collections.deque as FIFO queue.
+
+    The visitors are optional; a visitor returning a true value stops the whole traversal.
+
+    - pre(v, e) is called when v is discovered through edge e (None for a source),
+    - edge(e, u, v, kind) is called for every edge e explored from u to v, kind being TREE or CROSS.
+
+    :param g: Graph
+    :param sources: iterable of start vertices, all at level 0
+    :param pre: discovery visitor
+    :param edge: edge visitor
+    :param discovered: dictionary mapping each vertex to the edge that was used to discover it
+                       (None for sources); vertices already in it are not visited again
+    :return: the discovered dictionary
+    """
+    if discovered is None:
+        discovered = {}
+    queue = deque()
+    for s in sources:
+        if s not in discovered:
+            discovered[s] = None
+            queue.append(s)
+            if pre is not None and pre(s, None):
+                return discovered
+
+    while queue:
+        u = queue.popleft()
+        for e in g.incident_edges(u):
+            v = e.opposite(u)
+            if v not in discovered:
+                discovered[v] = e
+                if edge is not None and edge(e, u, v, TREE):
+                    return discovered
+                if pre is not None and pre(v, e):
+                    return discovered
+                queue.append(v)
+            elif edge is not None and edge(e, u, v, CROSS):
+                return discovered
+    return discovered
+
+
+def walk_back(discovered, v):
+    """Return the vertices from the root of v's traversal tree to v, following discovery edges"""
+    path = [v]
+    e = discovered[v]
+    while e is not None:
+        v = e.opposite(v)
+        path.append(v)
+        e = discovered[v]
+    path.reverse()
+    return path
+
+
+if __name__ == "__main__":
+    g = Graph(directed=True)
+    v1 = g.insert_vertex(1)
+    v2 = g.insert_vertex(2)
+    v3 = g.insert_vertex(3)
+    v4 = g.insert_vertex(4)
+    v5 = g.insert_vertex(5)
+
+    g.insert_edge(v1, v3)
+    g.insert_edge(v2, v1)
+    g.insert_edge(v3, v2)
+    g.insert_edge(v1, v4)
+    g.insert_edge(v4, v5)
+    g.insert_edge(v5, v3)
+
+    depth_first(g, [v1], pre=lambda v, e: print("discover", v, "via", e), post=lambda v: print("finish", v),
+                edge=lambda e, u, v, kind: print(kind, "edge", e))
+    print(walk_back(breadth_first(g, [v1]), v2))  # [1, 3, 2]
+
+    # benchmark: a 1M vertex path graph is far deeper than the recursion limit
+    from csr_graph import CSRGraph
+
+    n = 1_000_000
+    path_graph = CSRGraph.from_arrays(n, range(n - 1), range(1, n), directed=True)
+    print(f"path graph with {n} vertices, recursion limit {sys.getrecursionlimit()}")
+    start = time.perf_counter()
+    forest = depth_first(path_graph, [0])
+    print(f"depth_first: {len(forest)} vertices in {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    kinds = {}
+    depth_first(path_graph, edge=lambda e, u, v, kind: kinds.__setitem__(kind, kinds.get(kind, 0) + 1))
+    print(f"depth_first with edge classification: {kinds} in {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    levels = breadth_first(path_graph, [0])
+    print(f"breadth_first: {len(levels)} vertices in {time.perf_counter() - start:.2f} s")